@@ -8,6 +8,22 @@ module.exports = {
             autorestart: true,
             watch: false,
             max_memory_restart: '1G',
+            env: {
+                  PCAP_RUN_JOBS: 'true',
+            },
+      },
+      {
+            name: 'elastic-api-asgi',
+            script: 'uvicorn',
+            args: 'elastic_search_api_new.asgi:application --host 0.0.0.0 --port 8001',
+            interpreter: 'none',
+            instances: 1,
+            autorestart: true,
+            watch: false,
+            max_memory_restart: '1G',
+            env: {
+                  PCAP_RUN_JOBS: 'true',
+            },
       }
   ]
 };
\ No newline at end of file
@@ -1,6 +1,30 @@
+import os
+import sys
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ElasticApisConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'elastic_apis'
+
+    def ready(self):
+        # replay whatever is left in the ingest spool and pick up the queued pcap jobs as soon as the
+        # server is up, not on the first request. Management commands and the runserver autoreloader
+        # parent must not take the spool or the job queue, and only the processes started with
+        # PCAP_RUN_JOBS run pcap jobs.
+        if os.path.basename(sys.argv[0]) == "manage.py" and not (
+                "runserver" in sys.argv and os.environ.get("RUN_MAIN") == "true"):
+            return
+        from .views import ingest_spool, pcap_jobs
+        from .spool import SpoolUnavailable, SpoolLocked
+        if settings.INGEST_SPOOL_DIR:
+            try:
+                ingest_spool.start()
+            except SpoolLocked as ex:
+                print("ERROR: ingest spool not started, set a separate INGEST_SPOOL_DIR for every server process:", ex)
+            except SpoolUnavailable as ex:
+                print("Ingest spool not started", ex)
+        if settings.PCAP_RUN_JOBS and not pcap_jobs.start():
+            print("Pcap jobs are run by another server process")
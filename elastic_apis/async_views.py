@@ -0,0 +1,140 @@
+import asyncio
+import json
+import sys
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+
+from elastic_search_api_new.async_api import AsyncAPIView, get_async_client
+from elastic_search_api_new.search_cache import async_cached_search
+from elastic_search_api_new.query_builder import hits_filter_path
+from .pagination import async_search_page, InvalidCursor
+from .views import build_data_search, format_data_hit, data_fields, index_name, write_index_name, \
+    metrics_broadcaster, ingest_document, SystemData
+
+
+# Async versions of the Elasticsearch backed views, served through the ASGI application.
+# They take the same parameters and return the same responses as their counterparts in views.py.
+class AsyncElasticData(AsyncAPIView):
+    async def get(self, request):
+        try:
+            if int(request.GET.get("size", 10)) <= 0:
+                return JsonResponse({"message": "size must be greater than 0"}, safe=False, status=400)
+            client = get_async_client()
+            # the resolver may need to list indices through the sync client, keep that off the loop
+            search_index, search_query = await sync_to_async(build_data_search, thread_sensitive=False)(request.GET)
+            if search_index == "" and not request.GET.get("cursor"):
+                response = {"data": [], "message": "No Data Found"}
+                if "cursor" in request.GET:
+                    response["next_cursor"] = None
+                return JsonResponse(response, safe=False, status=404)
+
+            if "cursor" in request.GET:
+                hits, next_cursor = await async_search_page(
+                    client,
+                    search_index,
+                    search_query["query"],
+                    search_query["size"],
+                    cursor=request.GET.get("cursor"),
+                    source=search_query["_source"],
+                    filter_path=hits_filter_path(data_fields),
+                )
+                response_data = [format_data_hit(_res) for _res in hits]
+                message = "Data Found" if len(response_data) else "No Data Found"
+                response = {"data": response_data, "next_cursor": next_cursor, "message": message}
+                return JsonResponse(response, safe=False, status=200)
+
+            res_filter_parameters = await async_cached_search(
+                client,
+                index=search_index,
+                cache_index=index_name,
+                body=search_query,
+                filter_path=hits_filter_path(data_fields),
+            )
+            if len(res_filter_parameters) == 0:
+                response = {"data": [], "message": "No Data Found"}
+                return JsonResponse(response, safe=False, status=404)
+            else:
+                response_data = [format_data_hit(_res) for _res in res_filter_parameters['hits']['hits']]
+                response = {"data": response_data, "message": "Data Found"}
+                return JsonResponse(response, safe=False, status=200)
+
+        except InvalidCursor as ex:
+            return JsonResponse({"message": str(ex)}, safe=False, status=400)
+        except Exception as ex:
+            print("Error on line {}".format(sys.exc_info()[-1].tb_lineno), type(ex).__name__, ex)
+            error = {
+                "message": "something went wrong"
+            }
+            return JsonResponse(error, safe=False, status=500)
+
+
+class AsyncSystemData(AsyncAPIView):
+    async def post(self, request):
+        try:
+            data = request.data
+            data_add_index = write_index_name
+            timestamp = int(datetime.now().timestamp())
+            if not isinstance(data, dict) or len(data) == 0:
+                error = {
+                    "message": "request body is missing"
+                }
+                return JsonResponse(error, safe=False, status=400)
+            data['@timestamp'] = timestamp
+            wait = request.GET.get("wait", "").lower() in ("1", "true")
+            # same spool and bulk ingester as SystemData, off the loop since the spool fsyncs and `wait` blocks
+            return await sync_to_async(ingest_document, thread_sensitive=False)(
+                data_add_index, dict(data), wait, SystemData.flush_timeout
+            )
+
+        except Exception as ex:
+            print("Error on line {}".format(sys.exc_info()[-1].tb_lineno), type(ex).__name__, ex)
+            error = {
+                "message": "something went wrong"
+            }
+            return JsonResponse(error, safe=False, status=500)
+
+
+class AsyncMetricsStream(AsyncAPIView):
+    """
+        Server-Sent Events stream of the host and container metrics. The first event is a full
+        `snapshot`, the following `delta` events only carry the values that changed, and a comment
+        is sent when nothing changed for `keep_alive` seconds. Only served by the ASGI application,
+        the WSGI server would buffer the whole stream.
+
+        A browser EventSource can not send the Authorization header: it opens the stream with the
+        token from `system/metrics/stream/token` as `?token=`, valid for METRICS_STREAM_TOKEN_MAX_AGE
+        seconds. The stream ends after `max_duration` seconds and EventSource clients reconnect on
+        their own, so a client that went away unnoticed does not stay subscribed forever. A reconnect
+        with an expired token gets a 401 and closes the EventSource, the client then opens a new one
+        with a fresh token.
+    """
+    keep_alive = 15
+    max_duration = 3600
+    query_token_max_age = settings.METRICS_STREAM_TOKEN_MAX_AGE
+
+    async def get(self, request):
+        subscriber = metrics_broadcaster.subscribe()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_duration
+
+        async def events():
+            try:
+                yield "retry: 1000\n\n"
+                while loop.time() < deadline:
+                    try:
+                        event, data = await asyncio.wait_for(subscriber.get(), self.keep_alive)
+                    except asyncio.TimeoutError:
+                        yield ": keep-alive\n\n"
+                        continue
+                    yield "event: {}\ndata: {}\n\n".format(event, json.dumps(data))
+            finally:
+                metrics_broadcaster.unsubscribe(subscriber)
+
+        response = StreamingHttpResponse(events(), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        # keep nginx from buffering the stream
+        response["X-Accel-Buffering"] = "no"
+        return response
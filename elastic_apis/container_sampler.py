@@ -0,0 +1,91 @@
+import threading
+import time
+
+from .docker_metrics import container_stats_values
+
+
+class ContainerSampler:
+    """
+        Keeps the latest metrics of every Docker container in memory.
+
+        Every running container gets its own thread reading `stats(stream=True)`. Docker sends a
+        document about once a second that already carries the previous sample in `precpu_stats`,
+        so CPU% comes out of every document without a second call. A background pass reads the
+        containers from `inventory` every `refresh_interval` seconds to pick up new ones and to drop
+        the removed ones. The stream of a stopped container ends on its own and the container is
+        reported with zero metrics.
+
+        `snapshot` only copies what is in memory, it never calls Docker.
+    """
+
+    def __init__(self, inventory, refresh_interval=1):
+        self.inventory = inventory
+        self.refresh_interval = refresh_interval
+        self.infos = {}
+        self.values = {}
+        self.streams = {}
+        self.listed_at = None
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def refresh(self):
+        if not self.inventory.ready():
+            return
+        entries = self.inventory.items()
+        infos = {info["id"]: info for _, info in entries}
+        with self.lock:
+            self.infos = infos
+            for container_id in list(self.values):
+                if container_id not in infos:
+                    del self.values[container_id]
+            for container, _ in entries:
+                if container.status != "running":
+                    self.values[container.id] = container_stats_values({})
+                elif container.id not in self.streams:
+                    thread = threading.Thread(
+                        target=self.stream, args=(container,), name="container-stats", daemon=True)
+                    self.streams[container.id] = thread
+                    thread.start()
+        self.listed_at = time.time()
+
+    def stream(self, container):
+        try:
+            for stats in container.stats(stream=True, decode=True):
+                if self.stop_event.is_set() or container.id not in self.infos:
+                    break
+                values = container_stats_values(stats)
+                with self.lock:
+                    self.values[container.id] = values
+        except Exception as ex:
+            print("Container stats stream ended", container.name, type(ex).__name__, ex)
+        finally:
+            with self.lock:
+                self.streams.pop(container.id, None)
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.refresh()
+            except Exception as ex:
+                print("Unable to refresh the container list", type(ex).__name__, ex)
+            self.stop_event.wait(self.refresh_interval)
+
+    def start(self):
+        self.inventory.start()
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self.run, name="container-sampler", daemon=True)
+            self.thread.start()
+
+    def snapshot(self):
+        """
+            Returns a list of (info, values) pairs, values is None until the first stats document of
+            a running container arrived.
+        """
+        with self.lock:
+            return [(info, self.values.get(container_id)) for container_id, info in self.infos.items()]
+
+    def ready(self):
+        return self.listed_at is not None
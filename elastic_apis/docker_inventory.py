@@ -0,0 +1,124 @@
+import threading
+import time
+
+import docker
+
+from .docker_metrics import format_container_info
+
+# container events that can change the name, status or networks of a container
+container_actions = {"create", "start", "restart", "stop", "die", "kill", "pause", "unpause", "rename", "update",
+                     "destroy"}
+network_actions = {"connect", "disconnect"}
+
+
+class DockerInventory:
+    """
+        In-memory list of the Docker containers with their name, status, IP address and networks.
+
+        A background thread lists the containers once, then follows the Docker events stream and
+        only re-reads the container named in a start, stop, die, rename, destroy or network
+        connect/disconnect event. When the stream breaks the list is loaded again from scratch, so a
+        missed event never leaves it stale for long.
+
+        The Docker client is created once and shared with the callers through `get_client`, its
+        `timeout` applies to every call except the events stream.
+    """
+    max_pool_size = 128
+
+    def __init__(self, timeout=None, retry_interval=5):
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.client = None
+        self.entries = {}
+        self.loaded = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def get_client(self):
+        if self.client is None:
+            # the container stats streams each hold a connection
+            self.client = docker.from_env(timeout=self.timeout, max_pool_size=self.max_pool_size)
+        return self.client
+
+    def describe(self, container):
+        info = format_container_info(container)
+        networks = container.attrs['NetworkSettings'].get('Networks') or {}
+        info["networks"] = [
+            {"name": name, "ip_address": network.get('IPAddress', "")} for name, network in networks.items()
+        ]
+        return container, info
+
+    def load(self):
+        containers = self.get_client().containers.list(all=True)
+        self.entries = {container.id: self.describe(container) for container in containers}
+        self.loaded.set()
+
+    def update(self, container_id):
+        try:
+            entry = self.describe(self.get_client().containers.get(container_id))
+        except docker.errors.NotFound:
+            entry = None
+        with self.lock:
+            entries = dict(self.entries)
+            if entry is None:
+                entries.pop(container_id, None)
+            else:
+                entries[entry[0].id] = entry
+            self.entries = entries
+
+    def handle(self, event):
+        attributes = event.get("Actor", {}).get("Attributes", {})
+        if event.get("Type") == "container" and event.get("Action") in container_actions:
+            self.update(event["Actor"]["ID"])
+        elif event.get("Type") == "network" and event.get("Action") in network_actions and "container" in attributes:
+            self.update(attributes["container"])
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                since = int(time.time())
+                self.load()
+                # events since the listing started, so nothing in between is missed
+                for event in self.get_client().events(
+                        decode=True, since=since, filters={"type": ["container", "network"]}):
+                    if self.stop_event.is_set():
+                        return
+                    self.handle(event)
+            except Exception as ex:
+                print("Docker events stream ended", type(ex).__name__, ex)
+            self.stop_event.wait(self.retry_interval)
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self.run, name="docker-inventory", daemon=True)
+            self.thread.start()
+
+    def ready(self):
+        return self.loaded.is_set()
+
+    def wait_ready(self, timeout=None):
+        self.start()
+        return self.loaded.wait(timeout)
+
+    def items(self):
+        """
+            Returns the (container, info) pairs of every known container.
+        """
+        return list(self.entries.values())
+
+    def get(self, container_id):
+        """
+            Looks a container up by id, name or unique id prefix like `docker` does, returns None
+            when there is no such container.
+        """
+        entries = self.entries
+        if container_id in entries:
+            return entries[container_id][0]
+        for container, _ in entries.values():
+            if container.name == container_id:
+                return container
+        matches = [container for key, (container, _) in entries.items() if key.startswith(container_id)]
+        return matches[0] if len(matches) == 1 and container_id else None
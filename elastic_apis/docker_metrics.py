@@ -0,0 +1,129 @@
+import sys
+import time
+
+
+# Function to calculate CPU percentage
+def calculate_cpu_percent(d):
+    try:
+        cpu_count = d["cpu_stats"]["online_cpus"]
+    except:
+        cpu_count = 0
+    cpu_percent = 0.0
+    try:
+        precpu_stats = float(d["precpu_stats"]["cpu_usage"]["total_usage"])
+    except:
+        precpu_stats = 0
+
+    try:
+        system_cpu_usage = float(d["precpu_stats"]["system_cpu_usage"])
+    except:
+        system_cpu_usage = 0
+
+
+    cpu_delta = float(d["cpu_stats"]["cpu_usage"]["total_usage"]) - float(precpu_stats)
+    system_delta = float(d["cpu_stats"]["system_cpu_usage"]) - system_cpu_usage
+
+    if system_delta > 0.0 and cpu_delta > 0.0:
+        try:
+            cpu_percent = round((cpu_delta / system_delta) * cpu_count * 100.0, 2)
+        except:
+            cpu_percent = 0
+    return cpu_percent
+
+
+# Function to get network I/O
+def get_network_io(d):
+    networks = d["networks"] if "networks" in d else {}
+    total_rx, total_tx = 0, 0
+    for net in networks.values():
+        total_rx += net["rx_bytes"]
+        total_tx += net["tx_bytes"]
+    return total_rx, total_tx
+
+def get_memory_usage(container_stats):
+    memory_usage = container_stats['memory_stats']['usage'] if "usage" in container_stats['memory_stats'] else 0
+    max_memory = container_stats['memory_stats']['limit'] if "limit" in container_stats['memory_stats'] else 0
+    memory_percent = (memory_usage / max_memory) * 100
+    return memory_usage, memory_percent
+
+
+# Function to get the IP address of a container
+def get_container_ip(container):
+    ip_address = container.attrs['NetworkSettings']['IPAddress']
+    if not ip_address:  # IPAddress might be an empty string if the container is not using the default bridge network
+        # If the container is connected to a user-defined network, fetch the IP from the Networks section
+        networks = container.attrs['NetworkSettings']['Networks']
+        if networks:
+            # Get the IP address from the first available network
+            ip_address = list(networks.values())[0]['IPAddress']
+    return ip_address
+
+
+# Function to get the details of a container that do not need its stats
+def format_container_info(container):
+    return {
+        'name': f"{container.name}",
+        'title': f"{container.name}",
+        'status': f"{container.status}",
+        "id": f"{container.id}",
+        "ip_address": get_container_ip(container),
+    }
+
+
+container_stats_fields = ["cpu_percent", "memory_usage", "memory_limit", "net_io", "block_io", "pids"]
+
+
+# Function to get the raw metric values out of a docker stats document
+def container_stats_values(stats):
+    cpu_percent = 0
+    # stopped containers come back without cpu stats
+    if stats.get("cpu_stats"):
+        try:
+            cpu_percent = calculate_cpu_percent(stats)
+        except Exception as ex:
+            print("Error on line {}".format(sys.exc_info()[-1].tb_lineno), type(ex).__name__, ex)
+    memory_stats = stats.get("memory_stats") or {}
+    net_rx, net_tx = get_network_io(stats)
+    try:
+        block_read, block_write = stats["blkio_stats"]["io_service_bytes_recursive"][0]["value"], \
+                                  stats["blkio_stats"]["io_service_bytes_recursive"][1]["value"]
+    except:
+        block_read, block_write = 0, 0
+    return {
+        "cpu_percent": cpu_percent,
+        "memory_usage": memory_stats.get("usage", 0),
+        "memory_limit": memory_stats.get("limit", 0),
+        "net_rx": net_rx,
+        "net_tx": net_tx,
+        "block_read": block_read,
+        "block_write": block_write,
+        "pids": (stats.get("pids_stats") or {}).get("current", 0),
+    }
+
+
+# Function to format the metric values of a container the way SystemProcessData returns them
+def format_container_stats(values):
+    return {
+        'cpu_percent': f"{values['cpu_percent']}",
+        'memory_usage': f"{values['memory_usage'] / (1024 ** 3):.2f}GiB",
+        'memory_limit': f"{values['memory_limit'] / (1024 ** 3):.2f}GiB",
+        'net_io': f"{values['net_rx'] / (1024 ** 2):.2f}MB / {values['net_tx'] / (1024 ** 2):.2f}MB",
+        'block_io': f"{values['block_read'] / (1024 ** 2):.2f}MB / {values['block_write'] / (1024 ** 2):.2f}MB",
+        'pids': values['pids'],
+    }
+
+
+# Function to collect the stats of one container with a one-shot stats call. Each call is bounded by the docker
+# client timeout, the retry for a new container is skipped when it could not finish within `timeout` seconds.
+def collect_container_stats(container, timeout=None):
+    started = time.monotonic()
+    stats = container.stats(stream=False)
+
+    # Some stats may not be immediately available for new containers
+    if 'precpu_stats' not in stats or not stats['precpu_stats']:
+        elapsed = time.monotonic() - started
+        if timeout is not None and 2 * elapsed + 1 > timeout:
+            raise TimeoutError("stats of a new container not complete in time")
+        time.sleep(1)  # Wait a second before retrying
+        stats = container.stats(stream=False)
+    return format_container_stats(container_stats_values(stats))
@@ -0,0 +1,60 @@
+"""
+Metric families for the `/metrics` endpoint, built from the snapshots of the host and container
+samplers. Values are raw numbers: bytes, percents and counts.
+"""
+
+
+# Function to get the metric families of a host sampler snapshot
+def host_families(snapshot):
+    if snapshot is None:
+        return []
+    values = snapshot["values"]
+    memory = snapshot["memory"]
+    disks = snapshot["disks"]
+    interfaces = snapshot["interfaces"]
+    disk_labels = [
+        [("device", disk["device"]), ("mountpoint", disk["mountpoint"]), ("fstype", disk["fstype"])] for disk in disks
+    ]
+    return [
+        ("host_cpu_usage_percent", "gauge", "CPU usage of the host.", [([], values["cpu_percent"])]),
+        ("host_cpu_core_usage_percent", "gauge", "CPU usage per core.",
+         [([("core", core)], percent) for core, percent in enumerate(snapshot["cpu_per_core"])]),
+        ("host_memory_total_bytes", "gauge", "Physical memory.", [([], memory["total"])]),
+        ("host_memory_used_bytes", "gauge", "Used memory.", [([], memory["used"])]),
+        ("host_memory_available_bytes", "gauge", "Available memory.", [([], memory["available"])]),
+        ("host_processes", "gauge", "Number of processes.", [([], values["pids"])]),
+        ("host_disk_read_bytes", "counter", "Bytes read from the disks.", [([], values["disk_read"])]),
+        ("host_disk_written_bytes", "counter", "Bytes written to the disks.", [([], values["disk_write"])]),
+        ("host_network_receive_bytes", "counter", "Bytes received per interface.",
+         [([("interface", interface["name"])], interface["bytes_recv"]) for interface in interfaces]),
+        ("host_network_transmit_bytes", "counter", "Bytes sent per interface.",
+         [([("interface", interface["name"])], interface["bytes_sent"]) for interface in interfaces]),
+        ("host_filesystem_available", "gauge", "1 when the usage of the mount could be read, 0 when it is stale.",
+         [(labels, 1 if disk["status"] == "ok" else 0) for labels, disk in zip(disk_labels, disks)]),
+        ("host_filesystem_size_bytes", "gauge", "Size of the mount.",
+         [(labels, disk["total"]) for labels, disk in zip(disk_labels, disks) if disk["status"] == "ok"]),
+        ("host_filesystem_used_bytes", "gauge", "Used space on the mount.",
+         [(labels, disk["used"]) for labels, disk in zip(disk_labels, disks) if disk["status"] == "ok"]),
+    ]
+
+
+# Function to get the metric families of a container sampler snapshot, a list of (info, values) pairs
+def container_families(snapshot):
+    labelled = [([("id", info["id"]), ("name", info["name"])], info, values) for info, values in snapshot]
+    sampled = [(labels, values) for labels, _, values in labelled if values is not None]
+
+    def family(name, kind, documentation, field):
+        return name, kind, documentation, [(labels, values[field]) for labels, values in sampled]
+
+    return [
+        ("container_running", "gauge", "1 when the container is running.",
+         [(labels, 1 if info["status"] == "running" else 0) for labels, info, _ in labelled]),
+        family("container_cpu_usage_percent", "gauge", "CPU usage of the container.", "cpu_percent"),
+        family("container_memory_usage_bytes", "gauge", "Memory used by the container.", "memory_usage"),
+        family("container_memory_limit_bytes", "gauge", "Memory limit of the container.", "memory_limit"),
+        family("container_processes", "gauge", "Number of processes in the container.", "pids"),
+        family("container_network_receive_bytes", "counter", "Bytes received by the container.", "net_rx"),
+        family("container_network_transmit_bytes", "counter", "Bytes sent by the container.", "net_tx"),
+        family("container_block_read_bytes", "counter", "Bytes read by the container.", "block_read"),
+        family("container_block_written_bytes", "counter", "Bytes written by the container.", "block_write"),
+    ]
@@ -0,0 +1,164 @@
+import fnmatch
+import threading
+import time
+
+import psutil
+
+
+host_history_fields = ["cpu_percent", "memory_used", "memory_total", "net_rx", "net_tx", "disk_read", "disk_write",
+                       "pids"]
+
+
+# Function to read the host counters without blocking, cpu_percent is measured since the previous call. Pass the
+# `psutil.virtual_memory()` result when the caller already read it.
+def host_metric_values(memory=None):
+    if memory is None:
+        memory = psutil.virtual_memory()
+    net = psutil.net_io_counters()
+    disk = psutil.disk_io_counters()
+    return {
+        "cpu_percent": psutil.cpu_percent(interval=None),
+        "memory_used": memory.used,
+        "memory_total": memory.total,
+        "net_rx": net.bytes_recv if net else 0,
+        "net_tx": net.bytes_sent if net else 0,
+        "disk_read": disk.read_bytes if disk else 0,
+        "disk_write": disk.write_bytes if disk else 0,
+        "pids": len(psutil.pids()),
+    }
+
+
+class DiskProber:
+    """
+        Reads the usage of the mounted partitions without letting a stale mount block the caller.
+
+        Partitions whose fstype is in `exclude_fstypes` or whose mountpoint matches one of the
+        `exclude_paths` patterns are skipped. Every other mount is probed on its own thread and
+        `probe` waits at most `timeout` seconds for all of them together: a mount that did not
+        answer in time (a hung NFS or fuse mount) is reported as `unavailable` and is not probed
+        again while its previous probe is still stuck. Results are reused for `ttl` seconds.
+    """
+
+    def __init__(self, timeout=2, ttl=30, exclude_fstypes=(), exclude_paths=()):
+        self.timeout = timeout
+        self.ttl = ttl
+        self.exclude_fstypes = set(exclude_fstypes)
+        self.exclude_paths = list(exclude_paths)
+        self.results = {}
+        self.probes = {}
+        self.lock = threading.Lock()
+
+    def included(self, partition):
+        if partition.fstype in self.exclude_fstypes:
+            return False
+        return not any(fnmatch.fnmatch(partition.mountpoint, pattern) for pattern in self.exclude_paths)
+
+    def probe_mount(self, mountpoint):
+        try:
+            usage = psutil.disk_usage(mountpoint)
+            result = {"status": "ok", "total": usage.total, "used": usage.used, "percent": usage.percent}
+        except Exception as ex:
+            print("Unable to read the usage of", mountpoint, type(ex).__name__, ex)
+            result = None
+        with self.lock:
+            self.results[mountpoint] = (time.monotonic(), result)
+            self.probes.pop(mountpoint, None)
+
+    def probe(self):
+        partitions = [partition for partition in psutil.disk_partitions() if self.included(partition)]
+        started = []
+        with self.lock:
+            for partition in partitions:
+                mountpoint = partition.mountpoint
+                cached = self.results.get(mountpoint)
+                if mountpoint in self.probes or (cached and time.monotonic() - cached[0] < self.ttl):
+                    continue
+                thread = threading.Thread(target=self.probe_mount, args=(mountpoint,), name="disk-probe", daemon=True)
+                self.probes[mountpoint] = thread
+                thread.start()
+                started.append(thread)
+        deadline = time.monotonic() + self.timeout
+        for thread in started:
+            thread.join(max(deadline - time.monotonic(), 0))
+
+        disks = []
+        with self.lock:
+            for partition in partitions:
+                cached = self.results.get(partition.mountpoint)
+                result = None
+                if partition.mountpoint not in self.probes and cached:
+                    result = cached[1]
+                disk = {"device": partition.device, "mountpoint": partition.mountpoint, "fstype": partition.fstype}
+                disk.update(result or {"status": "unavailable", "total": None, "used": None, "percent": None})
+                disks.append(disk)
+        return disks
+
+
+# Function to read the addresses and traffic counters of every network interface
+def interface_details():
+    counters = psutil.net_io_counters(pernic=True)
+    interfaces = []
+    for name, addresses in psutil.net_if_addrs().items():
+        counter = counters.get(name)
+        interfaces.append({
+            "name": name,
+            "addresses": [{"family_name": address.family.name, "address": address.address} for address in addresses],
+            "bytes_sent": counter.bytes_sent if counter else 0,
+            "bytes_recv": counter.bytes_recv if counter else 0,
+        })
+    return interfaces
+
+
+class HostSampler:
+    """
+        Keeps a snapshot of the host metrics in memory.
+
+        A background thread samples CPU (overall and per core, measured over the time since the
+        previous pass, so it never sleeps inside psutil), memory, interfaces and the counters in
+        `host_history_fields` every `interval` seconds, and disk usage through `disk_prober`.
+        Readers get the last snapshot and never call psutil themselves.
+    """
+
+    def __init__(self, disk_prober, interval=1):
+        self.disk_prober = disk_prober
+        self.interval = interval
+        self.snapshot = None
+        self.sampled = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def sample(self):
+        disks = self.disk_prober.probe()
+        memory = psutil.virtual_memory()
+        values = host_metric_values(memory)
+        self.snapshot = {
+            "ts": time.time(),
+            "values": values,
+            "cpu_per_core": psutil.cpu_percent(interval=None, percpu=True),
+            "memory": memory._asdict(),
+            "disks": disks,
+            "interfaces": interface_details(),
+        }
+        self.sampled.set()
+
+    def run(self):
+        # the first cpu_percent calls only set the reference point
+        psutil.cpu_percent(interval=None)
+        psutil.cpu_percent(interval=None, percpu=True)
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as ex:
+                print("Unable to sample the host metrics", type(ex).__name__, ex)
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self.run, name="host-sampler", daemon=True)
+            self.thread.start()
+
+    def wait_ready(self, timeout=None):
+        self.start()
+        return self.sampled.wait(timeout)
@@ -0,0 +1,113 @@
+import bisect
+import threading
+import time
+
+from elastic_search_api_new.settings import es_url
+from elastic_search_api_new.query_builder import build_query, range_filter, build_aggregation, composite_agg
+
+
+class HostnameIndex:
+    """
+        In-process prefix index of the distinct hostnames found in `index`.
+
+        Hostnames are kept in a sorted list of (lowercased, original) pairs, so a completion is a
+        binary search plus a short scan and never touches the cluster. A background thread seeds the
+        list with a composite aggregation over `field` and then only aggregates documents newer than
+        the previous pass to pick up new hosts. A full reseed every `full_refresh_interval` seconds
+        drops hostnames that have aged out of the indices.
+
+        The sorted list is rebuilt and swapped on every change, readers never take a lock.
+    """
+
+    def __init__(self, index, field, resolver=None, refresh_interval=30, full_refresh_interval=3600, page_size=1000):
+        self.index = index
+        self.field = field
+        self.resolver = resolver
+        self.refresh_interval = refresh_interval
+        self.full_refresh_interval = full_refresh_interval
+        self.page_size = page_size
+        self.entries = []
+        self.seeded_at = None
+        self.refreshed_from = None
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def fetch_hostnames(self, since_ms=None):
+        query = build_query([range_filter("@timestamp", gte=since_ms, format="strict_date_optional_time||epoch_millis")])
+        index = self.index
+        if since_ms is not None and self.resolver is not None:
+            index = self.resolver.resolve(str(since_ms))
+            if index == "":
+                return set()
+        hostnames = set()
+        after_key = None
+        while True:
+            res = es_url.search(
+                index=index,
+                body=build_aggregation(query, {
+                    "hostnames": composite_agg("hostname", self.field, size=self.page_size, after=after_key),
+                }),
+                filter_path=["aggregations.hostnames.buckets.key", "aggregations.hostnames.after_key"],
+            )
+            aggregation = res.get("aggregations", {}).get("hostnames", {})
+            buckets = aggregation.get("buckets", [])
+            for bucket in buckets:
+                hostname = bucket["key"]["hostname"]
+                if hostname:
+                    hostnames.add(str(hostname))
+            after_key = aggregation.get("after_key", {}).get("hostname")
+            if len(buckets) < self.page_size or after_key is None:
+                return hostnames
+
+    def replace(self, hostnames):
+        self.entries = sorted((hostname.lower(), hostname) for hostname in hostnames)
+
+    def merge(self, hostnames):
+        entries = self.entries
+        known = set(hostname for _, hostname in entries)
+        new = [hostname for hostname in hostnames if hostname not in known]
+        if new:
+            self.entries = sorted(entries + [(hostname.lower(), hostname) for hostname in new])
+
+    def refresh(self):
+        started_ms = int(time.time() * 1000)
+        if self.seeded_at is None or time.monotonic() - self.seeded_at >= self.full_refresh_interval:
+            self.replace(self.fetch_hostnames())
+            self.seeded_at = time.monotonic()
+        else:
+            self.merge(self.fetch_hostnames(since_ms=self.refreshed_from))
+        # overlap the next pass with this one so documents indexed late are not missed
+        self.refreshed_from = started_ms - self.refresh_interval * 1000
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.refresh()
+            except Exception as ex:
+                print("Unable to refresh hostname index", type(ex).__name__, ex)
+            self.stop_event.wait(self.refresh_interval)
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self.run, name="hostname-index", daemon=True)
+            self.thread.start()
+
+    def complete(self, prefix, limit=10):
+        self.start()
+        entries = self.entries
+        prefix = prefix.lower()
+        position = bisect.bisect_left(entries, (prefix, ""))
+        completions = []
+        while position < len(entries) and len(completions) < limit:
+            key, hostname = entries[position]
+            if not key.startswith(prefix):
+                break
+            completions.append(hostname)
+            position += 1
+        return completions
+
+    def ready(self):
+        return self.seeded_at is not None
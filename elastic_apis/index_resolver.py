@@ -0,0 +1,191 @@
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+from elastic_search_api_new.settings import es_url
+
+# Keep the resolved index list well below the default 4kb http line limit of elasticsearch
+max_index_list_length = 3000
+
+date_math_units = {
+    "s": 1000,
+    "m": 60 * 1000,
+    "h": 60 * 60 * 1000,
+    "d": 24 * 60 * 60 * 1000,
+    "w": 7 * 24 * 60 * 60 * 1000,
+}
+date_math_pattern = re.compile(r"^now(?:([+-])(\d+)([smhdw]))?$")
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+# Function to turn a range bound into epoch milliseconds, None when it can not be understood
+def parse_time(value):
+    if value is None or value == "":
+        return None
+    value = str(value).strip()
+    match = date_math_pattern.match(value)
+    if match:
+        sign, amount, unit = match.groups()
+        offset = int(amount) * date_math_units[unit] if amount else 0
+        return now_ms() - offset if sign == "-" else now_ms() + offset
+    if value.isdigit():
+        number = int(value)
+        # epoch seconds (as written by SystemData.post) or epoch milliseconds
+        return number * 1000 if number < 10 ** 11 else number
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+class IndexResolver:
+    """
+        Maps a time range onto the concrete indices behind `pattern` that can hold matching documents.
+
+        A background thread keeps the min/max `time_field` of every backing index (daily indices or
+        data stream generations) in memory. Bounds are read with a top-level min/max aggregation per
+        index, which elasticsearch answers from the index points without scanning documents, and an
+        index whose newest document is older than `stable_after` seconds is not read again. Indices
+        still being written to are treated as open ended, and indices created since the last refresh
+        are picked up from the cluster metadata when a range reaches the present.
+
+        Until the first refresh has finished, or when a bound can not be parsed, the pattern itself
+        is returned so a query is never narrowed by mistake.
+    """
+
+    def __init__(self, pattern, time_field="@timestamp", refresh_interval=60, stable_after=3600, names_ttl=10):
+        self.pattern = pattern
+        self.time_field = time_field
+        self.refresh_interval = refresh_interval
+        self.stable_after_ms = stable_after * 1000
+        self.names_ttl = names_ttl
+        self.lock = threading.Lock()
+        self.bounds = {}
+        self.refreshed_at = None
+        self.names = []
+        self.names_fetched_at = 0
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def list_indices(self):
+        res = es_url.indices.resolve_index(name=self.pattern)
+        names = [index["name"] for index in res.get("indices", [])]
+        for data_stream in res.get("data_streams", []):
+            names.extend(data_stream.get("backing_indices", []))
+        return sorted(set(names))
+
+    def fetch_bounds(self, name):
+        res = es_url.search(
+            index=name,
+            body={
+                "size": 0,
+                "track_total_hits": False,
+                "aggs": {
+                    "min_time": {"min": {"field": self.time_field}},
+                    "max_time": {"max": {"field": self.time_field}},
+                },
+            },
+            filter_path=["aggregations"],
+        )
+        aggregations = res.get("aggregations", {})
+        min_time = aggregations.get("min_time", {}).get("value")
+        max_time = aggregations.get("max_time", {}).get("value")
+        if min_time is None or max_time is None:
+            return None, None
+        return int(min_time), int(max_time)
+
+    def is_open(self, bounds, refreshed_at):
+        return bounds[1] is None or bounds[1] >= refreshed_at - self.stable_after_ms
+
+    def refresh(self):
+        names = self.list_indices()
+        with self.lock:
+            known = dict(self.bounds)
+            refreshed_at = self.refreshed_at
+        bounds = {}
+        for name in names:
+            if name in known and refreshed_at is not None and not self.is_open(known[name], refreshed_at):
+                bounds[name] = known[name]
+            else:
+                bounds[name] = self.fetch_bounds(name)
+        with self.lock:
+            self.bounds = bounds
+            self.refreshed_at = now_ms()
+            self.names = names
+            self.names_fetched_at = time.monotonic()
+
+    def current_names(self):
+        with self.lock:
+            if time.monotonic() - self.names_fetched_at < self.names_ttl:
+                return self.names
+        names = self.list_indices()
+        with self.lock:
+            self.names = names
+            self.names_fetched_at = time.monotonic()
+        return names
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.refresh()
+            except Exception as ex:
+                print("Unable to refresh index metadata", type(ex).__name__, ex)
+            self.stop_event.wait(self.refresh_interval)
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self.run, name="index-resolver", daemon=True)
+            self.thread.start()
+
+    def resolve(self, time_from=None, time_to=None):
+        """
+            Returns a comma separated index list (or the pattern) to search for the given range, or
+            an empty string when no index can contain a document in the range.
+        """
+        self.start()
+        if not time_from and not time_to:
+            return self.pattern
+        range_from = parse_time(time_from)
+        range_to = parse_time(time_to)
+        if (time_from and range_from is None) or (time_to and range_to is None):
+            return self.pattern
+
+        with self.lock:
+            bounds = dict(self.bounds)
+            refreshed_at = self.refreshed_at
+        if refreshed_at is None:
+            return self.pattern
+
+        selected = set()
+        for name, (min_time, max_time) in bounds.items():
+            if min_time is None:
+                # empty at the last refresh, it can only hold documents written since then
+                if range_to is None or range_to >= refreshed_at - self.stable_after_ms:
+                    selected.add(name)
+                continue
+            if range_to is not None and min_time > range_to:
+                continue
+            if range_from is not None and max_time < range_from and not self.is_open((min_time, max_time), refreshed_at):
+                continue
+            selected.add(name)
+
+        if range_to is None or range_to >= refreshed_at:
+            try:
+                selected.update(name for name in self.current_names() if name not in bounds)
+            except Exception as ex:
+                print("Unable to list indices", type(ex).__name__, ex)
+                return self.pattern
+
+        indices = ",".join(sorted(selected))
+        if len(indices) > max_index_list_length:
+            return self.pattern
+        return indices
@@ -0,0 +1,255 @@
+import atexit
+import json
+import threading
+import time
+
+from elastic_search_api_new.settings import es_url
+
+
+class IngestTicket:
+    """
+        Handed back for every buffered document, `wait` blocks until its bulk request completed.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.accepted = False
+        self.error = None
+
+    def resolve(self, accepted, error=None, retryable=False):
+        self.accepted = accepted
+        self.error = error
+        self.done.set()
+
+    def wait(self, timeout=None):
+        if not self.done.wait(timeout):
+            self.error = "timed out waiting for the bulk flush"
+            return False
+        return self.accepted
+
+
+class IngestBatchTicket:
+    """
+        Shared ticket for a stream of documents, it only counts results so memory does not grow with
+        the number of documents. Call `add` per submitted document, `close` once the last one is
+        submitted, then `wait` for all of them.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.submitted = 0
+        self.accepted = 0
+        self.failed = 0
+        self.retryable = 0
+        self.closed = False
+
+    def add(self):
+        with self.lock:
+            self.submitted += 1
+
+    def resolve(self, accepted, error=None, retryable=False):
+        with self.lock:
+            if accepted:
+                self.accepted += 1
+            else:
+                self.failed += 1
+                if retryable:
+                    self.retryable += 1
+            self.check()
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.check()
+
+    def check(self):
+        if self.closed and self.accepted + self.failed >= self.submitted:
+            self.done.set()
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+
+class BulkIngester:
+    """
+        Buffers documents in-process and writes them with the `_bulk` API.
+
+        Documents submitted with a `doc_id` are created under that id, and a 409 conflict for them
+        counts as accepted: the document was already written by an earlier attempt. That keeps
+        replays (see `IngestSpool`) idempotent.
+
+        A flush happens when `max_docs` documents or `max_bytes` of source are buffered, when the
+        oldest buffered document is `flush_interval` seconds old, or right away when a caller waits
+        for its document. Items rejected with 429 are retried with exponential backoff up to
+        `max_retries` times, every other item error fails only that document. Once `max_buffered`
+        documents are waiting, `submit` blocks until the flusher has caught up, so memory stays
+        bounded when Elasticsearch falls behind.
+    """
+
+    def __init__(self, max_docs=500, max_bytes=5 * 1024 * 1024, flush_interval=1.0, max_retries=3,
+                 max_buffered=50000, retry_backoff=0.5, on_flush=None):
+        self.max_docs = max_docs
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.max_buffered = max_buffered
+        self.retry_backoff = retry_backoff
+        self.on_flush = on_flush
+        self.condition = threading.Condition()
+        self.buffer = []
+        self.buffer_bytes = 0
+        self.first_buffered_at = None
+        self.flush_requested = False
+        self.thread = None
+        self.closed = False
+        self.accepted = 0
+        self.failed = 0
+        self.retried = 0
+        self.flushes = 0
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.thread = threading.Thread(target=self.run, name="bulk-ingester", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def submit(self, index, doc, flush=False, ticket=None, doc_id=None):
+        size = len(json.dumps(doc, default=str))
+        if ticket is None:
+            ticket = IngestTicket()
+        else:
+            ticket.add()
+        with self.condition:
+            self.start()
+            while len(self.buffer) >= self.max_buffered and not self.closed:
+                self.condition.wait()
+            if not self.buffer:
+                self.first_buffered_at = time.monotonic()
+            self.buffer.append((index, doc, ticket, size, doc_id))
+            self.buffer_bytes += size
+            if flush:
+                self.flush_requested = True
+            self.condition.notify_all()
+        return ticket
+
+    def should_flush(self):
+        if not self.buffer:
+            return False
+        return (
+            self.flush_requested
+            or self.closed
+            or len(self.buffer) >= self.max_docs
+            or self.buffer_bytes >= self.max_bytes
+            or time.monotonic() - self.first_buffered_at >= self.flush_interval
+        )
+
+    def take_batch(self):
+        batch = self.buffer[:self.max_docs]
+        self.buffer = self.buffer[self.max_docs:]
+        self.buffer_bytes -= sum(item[3] for item in batch)
+        self.first_buffered_at = time.monotonic() if self.buffer else None
+        self.flush_requested = self.flush_requested and bool(self.buffer)
+        self.condition.notify_all()
+        return batch
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.should_flush():
+                    if self.closed:
+                        return
+                    timeout = None
+                    if self.first_buffered_at is not None:
+                        timeout = max(self.first_buffered_at + self.flush_interval - time.monotonic(), 0.01)
+                    self.condition.wait(timeout)
+                batch = self.take_batch()
+            self.flush_batch(batch)
+
+    def flush_batch(self, batch):
+        pending = batch
+        attempt = 0
+        while pending:
+            body = []
+            for index, doc, _, _, doc_id in pending:
+                action = {"_index": index}
+                if doc_id is not None:
+                    action["_id"] = doc_id
+                body.append({"create": action})
+                body.append(doc)
+            try:
+                res = es_url.bulk(
+                    body=body,
+                    filter_path=["items.*.status", "items.*.error.type", "items.*.error.reason"],
+                )
+            except Exception as ex:
+                # the whole request failed (connection error, 429 on the request itself), retry everything
+                print("Bulk request failed", type(ex).__name__, ex)
+                res = None
+
+            if res is None:
+                retry = pending
+            else:
+                retry = []
+                for item, result in zip(pending, res["items"]):
+                    result = next(iter(result.values()))
+                    if result["status"] == 429:
+                        retry.append(item)
+                    elif result["status"] == 409 and item[4] is not None:
+                        self.resolve(item, True)
+                    elif result["status"] >= 300:
+                        error = result.get("error", {})
+                        self.resolve(item, False, error.get("reason", error.get("type")))
+                    else:
+                        self.resolve(item, True)
+
+            if retry and attempt < self.max_retries:
+                with self.condition:
+                    self.retried += len(retry)
+                time.sleep(self.retry_backoff * (2 ** attempt))
+                attempt += 1
+                pending = retry
+            else:
+                for item in retry:
+                    self.resolve(item, False, "rejected after {} retries".format(attempt), retryable=True)
+                pending = []
+        with self.condition:
+            self.flushes += 1
+        if self.on_flush is not None:
+            self.on_flush(batch)
+
+    def resolve(self, item, accepted, error=None, retryable=False):
+        # the spool shipper flushes batches on its own thread, next to the flusher
+        with self.condition:
+            if accepted:
+                self.accepted += 1
+            else:
+                self.failed += 1
+        if not accepted:
+            print("Unable to ingest document into", item[0], error)
+        item[2].resolve(accepted, error, retryable)
+
+    def flush(self):
+        with self.condition:
+            if self.buffer:
+                self.flush_requested = True
+                self.condition.notify_all()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=30)
+
+    def stats(self):
+        with self.condition:
+            return {
+                "buffered": len(self.buffer),
+                "buffered_bytes": self.buffer_bytes,
+                "accepted": self.accepted,
+                "failed": self.failed,
+                "retried": self.retried,
+                "flushes": self.flushes,
+            }
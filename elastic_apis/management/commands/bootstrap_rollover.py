@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from elastic_apis.rollover import bootstrap, BootstrapError
+
+
+class Command(BaseCommand):
+    help = "Create the lifecycle policy, index template and data stream SystemData writes to"
+
+    def handle(self, *args, **options):
+        try:
+            bootstrap(log=lambda message: self.stdout.write(message))
+        except BootstrapError as ex:
+            raise CommandError(str(ex))
+        self.stdout.write(self.style.SUCCESS("Rollover bootstrap finished"))
@@ -0,0 +1,184 @@
+import threading
+import time
+from array import array
+
+from .host_metrics import host_history_fields
+
+container_history_fields = ["cpu_percent", "memory_usage", "memory_limit", "net_rx", "net_tx", "block_read",
+                            "block_write", "pids"]
+# averaged within a bucket, every other field is a counter or a limit and keeps its last value
+gauge_fields = {"cpu_percent", "memory_usage", "memory_used", "pids"}
+
+
+class RingBuffer:
+    """
+        One downsampling tier: `size` buckets of `step` seconds stored in preallocated arrays, the
+        oldest bucket is overwritten once the buffer is full.
+
+        Samples are accumulated in the current bucket and written to the arrays when a sample for
+        a later bucket arrives. Gauges are averaged over the bucket, counters keep their last value.
+    """
+
+    def __init__(self, step, size, fields):
+        self.step = step
+        self.size = size
+        self.fields = fields
+        self.gauges = [field in gauge_fields for field in fields]
+        self.timestamps = array("d", [0.0]) * size
+        self.columns = [array("d", [0.0]) * size for _ in fields]
+        self.head = 0
+        self.count = 0
+        self.bucket = None
+        self.samples = 0
+        self.pending = [0.0] * len(fields)
+
+    def add(self, timestamp, values):
+        bucket = timestamp - timestamp % self.step
+        if self.bucket is not None and bucket != self.bucket:
+            self.commit()
+        self.bucket = bucket
+        self.samples += 1
+        for position, value in enumerate(values):
+            if self.gauges[position]:
+                self.pending[position] += value
+            else:
+                self.pending[position] = value
+
+    def commit(self):
+        self.timestamps[self.head] = self.bucket
+        for position, column in enumerate(self.columns):
+            value = self.pending[position]
+            column[self.head] = value / self.samples if self.gauges[position] else value
+        self.head = (self.head + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+        self.samples = 0
+        self.pending = [0.0] * len(self.fields)
+
+    def oldest(self):
+        if self.count == 0:
+            return self.bucket
+        return self.timestamps[(self.head - self.count) % self.size]
+
+    def covers(self, start):
+        # a tier that has not wrapped yet holds everything recorded so far
+        return self.count < self.size or self.oldest() <= start
+
+    def range(self, start, end):
+        timestamps = []
+        columns = [[] for _ in self.fields]
+        for offset in range(self.count):
+            slot = (self.head - self.count + offset) % self.size
+            timestamp = self.timestamps[slot]
+            if start <= timestamp <= end:
+                timestamps.append(timestamp)
+                for position, column in enumerate(self.columns):
+                    columns[position].append(column[slot])
+        # the bucket still being filled
+        if self.samples and start <= self.bucket <= end:
+            timestamps.append(self.bucket)
+            for position, value in enumerate(self.pending):
+                columns[position].append(value / self.samples if self.gauges[position] else value)
+        return timestamps, columns
+
+
+class MetricSeries:
+    def __init__(self, fields, tiers):
+        self.fields = fields
+        self.tiers = [RingBuffer(step, size, fields) for step, size in tiers]
+
+    def add(self, timestamp, values):
+        row = [float(values.get(field) or 0) for field in self.fields]
+        for tier in self.tiers:
+            tier.add(timestamp, row)
+
+    def range(self, start, end):
+        """
+            Reads from the finest tier still holding `start`, returns the tier step, the bucket
+            timestamps and one list per field.
+        """
+        tier = next((tier for tier in self.tiers if tier.covers(start)), self.tiers[-1])
+        timestamps, columns = tier.range(start, end)
+        return tier.step, timestamps, dict(zip(self.fields, columns))
+
+
+class MetricsHistory:
+    """
+        Fixed-size history of the host metrics and of every container known to `sampler`.
+
+        Every `interval` seconds a background thread records the latest snapshots of `host_sampler`
+        and `sampler` into one `MetricSeries` per target. Each series keeps one `RingBuffer`
+        per (step, size) tier, so memory per container is fixed by the tiers no matter how long the
+        container runs. The series of a container is dropped once it is gone from the sampler.
+        The values of the last pass are kept in `latest`.
+    """
+
+    def __init__(self, sampler, host_sampler, tiers, interval=1):
+        self.sampler = sampler
+        self.host_sampler = host_sampler
+        self.tiers = tiers
+        self.interval = interval
+        self.host = MetricSeries(host_history_fields, tiers)
+        self.containers = {}
+        self.names = {}
+        self.latest = None
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def record(self):
+        timestamp = time.time()
+        host_snapshot = self.host_sampler.snapshot
+        host_values = host_snapshot["values"] if host_snapshot else {}
+        snapshot = self.sampler.snapshot() if self.sampler.ready() else []
+        latest = {"ts": timestamp, "host": host_values, "containers": {}}
+        with self.lock:
+            if host_snapshot:
+                self.host.add(timestamp, host_values)
+            names = {}
+            for info, values in snapshot:
+                names[info["name"]] = info["id"]
+                if values is None:
+                    continue
+                latest["containers"][info["id"]] = dict(values, name=info["name"], status=info["status"])
+                series = self.containers.get(info["id"])
+                if series is None:
+                    series = self.containers[info["id"]] = MetricSeries(container_history_fields, self.tiers)
+                series.add(timestamp, values)
+            if self.sampler.ready():
+                known = set(names.values())
+                for container_id in list(self.containers):
+                    if container_id not in known:
+                        del self.containers[container_id]
+                self.names = names
+            self.latest = latest
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.record()
+            except Exception as ex:
+                print("Unable to record the metrics history", type(ex).__name__, ex)
+            self.stop_event.wait(self.interval)
+
+    def start(self):
+        self.sampler.start()
+        self.host_sampler.start()
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self.run, name="metrics-history", daemon=True)
+            self.thread.start()
+
+    def range(self, target, start, end):
+        """
+            `target` is "host" or a container id or name. Returns None for an unknown target.
+        """
+        self.start()
+        with self.lock:
+            if target == "host":
+                series = self.host
+            else:
+                series = self.containers.get(self.names.get(target, target))
+            if series is None:
+                return None
+            return series.range(start, end)
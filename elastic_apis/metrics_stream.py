@@ -0,0 +1,123 @@
+import asyncio
+import threading
+
+
+# Function to get the values of `current` that differ from `previous`
+def diff_values(previous, current):
+    return {key: value for key, value in current.items() if previous.get(key) != value}
+
+
+# Function to get the delta between two metric frames, None when nothing changed
+def diff_frames(previous, current):
+    delta = {}
+    host = diff_values(previous["host"], current["host"])
+    if host:
+        delta["host"] = host
+    containers = {}
+    for container_id, values in current["containers"].items():
+        changed = diff_values(previous["containers"].get(container_id, {}), values)
+        if changed:
+            containers[container_id] = changed
+    if containers:
+        delta["containers"] = containers
+    removed = [container_id for container_id in previous["containers"] if container_id not in current["containers"]]
+    if removed:
+        delta["removed"] = removed
+    if not delta:
+        return None
+    delta["ts"] = current["ts"]
+    return delta
+
+
+class MetricsSubscriber:
+    """
+        Queue of the events for one client, lives on the client's event loop.
+    """
+    max_queued = 10
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(self.max_queued)
+
+    def push(self, event, data, frame):
+        if self.queue.full():
+            # the client fell behind, deltas would not add up any more: start over from a snapshot
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            event, data = "snapshot", frame
+        self.queue.put_nowait((event, data))
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class MetricsBroadcaster:
+    """
+        Pushes the metrics recorded by `history` to every subscribed client.
+
+        One background thread reads `history.latest` every `interval` seconds and hands the same
+        delta (only the values that changed since the previous tick) to all subscribers, so the
+        collection cost does not grow with the number of open dashboards. A new subscriber, or one
+        whose queue overflowed, gets a full snapshot first.
+    """
+
+    def __init__(self, history, interval=1):
+        self.history = history
+        self.interval = interval
+        self.subscribers = set()
+        self.frame = None
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def subscribe(self):
+        """
+            Must be called from the event loop the subscriber is read on.
+        """
+        self.start()
+        subscriber = MetricsSubscriber(asyncio.get_running_loop())
+        with self.lock:
+            self.subscribers.add(subscriber)
+            if self.frame is not None:
+                subscriber.push("snapshot", self.frame, self.frame)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def publish(self):
+        frame = self.history.latest
+        if frame is None or frame is self.frame:
+            return
+        with self.lock:
+            previous, self.frame = self.frame, frame
+            subscribers = list(self.subscribers)
+        if previous is None:
+            event, data = "snapshot", frame
+        else:
+            event, data = "delta", diff_frames(previous, frame)
+            if data is None:
+                return
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.push, event, data, frame)
+            except RuntimeError:
+                # the loop of the subscriber is closed
+                self.unsubscribe(subscriber)
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.publish()
+            except Exception as ex:
+                print("Unable to publish the metrics", type(ex).__name__, ex)
+            self.stop_event.wait(self.interval)
+
+    def start(self):
+        self.history.start()
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self.run, name="metrics-stream", daemon=True)
+            self.thread.start()
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 11:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elastic_apis', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pcapjob',
+            name='process_groups',
+            field=models.JSONField(default=dict),
+        ),
+    ]
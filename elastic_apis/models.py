@@ -1,3 +1,31 @@
 from django.db import models
 
 # Create your models here.
+
+
+class PcapJob(models.Model):
+    """
+        One pcap analysis queued by `ExecutePcapFile`, run by `PcapJobQueue`.
+    """
+    STATUS_CHOICES = [
+        ("queued", "queued"),
+        ("running", "running"),
+        ("done", "done"),
+        ("failed", "failed"),
+        ("cancelled", "cancelled"),
+    ]
+
+    filename = models.CharField(max_length=255)
+    file_path = models.CharField(max_length=1024)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default="queued", db_index=True)
+    # finished tools / all tools
+    progress = models.FloatField(default=0)
+    # per tool: status, exit code, wall and CPU time, log paths and error
+    steps = models.JSONField(default=dict)
+    error = models.TextField(blank=True, default="")
+    # per running tool: process group id and start time, to stop tools left behind by a restart
+    process_groups = models.JSONField(default=dict)
+    cancel_requested = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
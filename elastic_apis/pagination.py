@@ -0,0 +1,145 @@
+import base64
+import json
+
+from elastic_search_api_new.settings import es_url
+
+# How long Elasticsearch keeps a point-in-time alive between two page requests
+pit_keep_alive = "2m"
+
+# @timestamp gives the natural order of the filebeat documents, _shard_doc is the
+# cheap tiebreaker that is only available while searching through a point-in-time
+cursor_sort = [
+    {"@timestamp": {"order": "desc", "unmapped_type": "date"}},
+    {"_shard_doc": "desc"},
+]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(pit_id, search_after):
+    """
+        Pack the point-in-time id and the sort values of the last hit of a page into an
+        opaque, url safe token that the client sends back to fetch the next page.
+    """
+    payload = json.dumps({"pit_id": pit_id, "search_after": search_after}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        pit_id = payload["pit_id"]
+        search_after = payload["search_after"]
+    except Exception:
+        raise InvalidCursor("cursor is not valid")
+    if not isinstance(pit_id, str) or not isinstance(search_after, list):
+        raise InvalidCursor("cursor is not valid")
+    return pit_id, search_after
+
+
+def open_pit(index):
+    res = es_url.open_point_in_time(index=index, keep_alive=pit_keep_alive)
+    return res["id"]
+
+
+def close_pit(pit_id):
+    try:
+        es_url.close_point_in_time(body={"id": pit_id})
+    except Exception as ex:
+        # the pit expires on its own after keep_alive, so failing to close it is not fatal
+        print("Unable to close point in time", type(ex).__name__, ex)
+
+
+def search_page(index, query, size, cursor=None, source=None, filter_path=None):
+    """
+        Fetch one page of `index` through a point-in-time sorted by `cursor_sort`.
+
+        When `cursor` is empty a new point-in-time is opened, otherwise the search continues
+        right after the last hit of the previous page with `search_after`, so every page costs
+        the same as the first one and the result set stays stable while new documents arrive.
+
+        Returns a tuple of (hits, next_cursor). `next_cursor` is None once the last page has been
+        read, in which case the point-in-time is already closed.
+    """
+    if cursor:
+        pit_id, search_after = decode_cursor(cursor)
+    else:
+        pit_id, search_after = open_pit(index), None
+
+    search_query, filter_path = build_page_query(query, size, pit_id, search_after, source, filter_path)
+    res = es_url.search(body=search_query, filter_path=filter_path)
+    hits, pit_id, last_page = read_page(res, size, pit_id)
+    if last_page:
+        close_pit(pit_id)
+        return hits, None
+    return hits, encode_cursor(pit_id, hits[-1]["sort"])
+
+
+async def async_search_page(client, index, query, size, cursor=None, source=None, filter_path=None):
+    """
+        `search_page` for async views, `client` is an `AsyncElasticsearch` instance.
+    """
+    if cursor:
+        pit_id, search_after = decode_cursor(cursor)
+    else:
+        res = await client.open_point_in_time(index=index, keep_alive=pit_keep_alive)
+        pit_id, search_after = res["id"], None
+
+    search_query, filter_path = build_page_query(query, size, pit_id, search_after, source, filter_path)
+    res = await client.search(body=search_query, filter_path=filter_path)
+    hits, pit_id, last_page = read_page(res, size, pit_id)
+    if last_page:
+        try:
+            await client.close_point_in_time(body={"id": pit_id})
+        except Exception as ex:
+            print("Unable to close point in time", type(ex).__name__, ex)
+        return hits, None
+    return hits, encode_cursor(pit_id, hits[-1]["sort"])
+
+
+def build_page_query(query, size, pit_id, search_after=None, source=None, filter_path=None):
+    search_query = {
+        "query": query,
+        "size": size,
+        "sort": cursor_sort,
+        "pit": {"id": pit_id, "keep_alive": pit_keep_alive},
+        "track_total_hits": False,
+    }
+    if search_after:
+        search_query["search_after"] = search_after
+    if source is not None:
+        search_query["_source"] = source
+
+    if filter_path is not None:
+        filter_path = list(filter_path) + ["pit_id", "hits.hits.sort"]
+    return search_query, filter_path
+
+
+def read_page(res, size, pit_id):
+    hits = res.get("hits", {}).get("hits", [])
+    # elasticsearch may hand back a new pit id, always continue with the latest one
+    pit_id = res.get("pit_id", pit_id)
+    # an empty page is always the last one, there is no hit to continue after
+    return hits, pit_id, len(hits) == 0 or len(hits) < size
+
+
+def iter_pages(index, query, size, source=None, filter_path=None):
+    """
+        Walk every page of `index` through a single point-in-time and yield the hits page by page.
+        Only one page is held in memory at a time, and the point-in-time is closed even when the
+        consumer stops early (for example when a streaming client disconnects).
+    """
+    cursor = None
+    try:
+        while True:
+            hits, cursor = search_page(index, query, size, cursor=cursor, source=source, filter_path=filter_path)
+            if hits:
+                yield hits
+            if cursor is None:
+                break
+    finally:
+        if cursor is not None:
+            close_pit(decode_cursor(cursor)[0])
@@ -0,0 +1,343 @@
+import fcntl
+import os
+import shutil
+import signal
+import subprocess
+import threading
+import time
+
+import psutil
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import PcapJob
+
+
+# Function to get the analyzers of a pcap as (name, argv, output directory) tuples, every tool writes
+# its logs to a directory of its own so the two can run at the same time
+def analysis_tools(file_path, output_dir):
+    file_path = os.path.abspath(file_path)
+    zeek_dir = os.path.abspath(os.path.join(output_dir, "zeek"))
+    suricata_dir = os.path.abspath(os.path.join(output_dir, "suricata"))
+    return [
+        # zeek writes its logs to the working directory
+        ("zeek", ["zeek", "-C", "-r", file_path], zeek_dir),
+        ("suricata", ["suricata", "-r", file_path, "-l", suricata_dir], suricata_dir),
+    ]
+
+
+# Function to read the end of a tool log, used as the error of a failed run
+def log_tail(path, size=1024):
+    try:
+        with open(path, "rb") as log:
+            log.seek(max(os.path.getsize(path) - size, 0))
+            return log.read().decode("utf-8", "replace").strip()
+    except OSError:
+        return ""
+
+
+# Function to stop what is left of a process group started by an earlier owner of the queue. The start time of
+# the group leader tells the group apart from a newer one that reuses its id.
+def stop_process_group(pgid, started, grace):
+    members = []
+    for process in psutil.process_iter():
+        try:
+            if os.getpgid(process.pid) != pgid:
+                continue
+            created = process.create_time()
+        except (psutil.Error, OSError):
+            continue
+        if process.pid == pgid and abs(created - started) > 0.1:
+            return
+        if created >= started - 0.1:
+            members.append(process)
+    if not members:
+        return
+    try:
+        os.killpg(pgid, signal.SIGTERM)
+        _, alive = psutil.wait_procs(members, timeout=grace)
+        if alive:
+            os.killpg(pgid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+# Function to format a job for the API responses
+def format_job(job):
+    return {
+        "id": job.id,
+        "filename": job.filename,
+        "status": job.status,
+        "progress": job.progress,
+        "steps": job.steps,
+        "error": job.error,
+        "cancel_requested": job.cancel_requested,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+class PcapJobQueue:
+    """
+        Runs the pcap analyses stored as `PcapJob` rows, `workers` jobs at a time.
+
+        Jobs are queued in the database, so they survive a restart and any process can queue or
+        cancel one. They are run by one of the processes created with `run_jobs`, the one holding
+        the lock file in `output_dir`: its dispatcher thread claims queued jobs in creation order
+        and runs the analyzers of a job at the same time, each as a subprocess in its own process
+        group with its output streamed to log files, stopped after its entry in `timeouts` (seconds
+        per tool name) or as soon as the cancellation of the job is requested. Jobs found running
+        when the queue starts were interrupted by a restart: the tools they left behind are stopped
+        and they are queued again.
+    """
+
+    def __init__(self, output_dir, workers=None, timeouts=None, poll_interval=1, kill_grace=5, run_jobs=False):
+        self.output_dir = output_dir
+        self.run_jobs = run_jobs
+        self.workers = workers or os.cpu_count() or 1
+        self.timeouts = timeouts or {}
+        self.poll_interval = poll_interval
+        self.kill_grace = kill_grace
+        self.running = {}
+        self.cancel_events = {}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.lock_file = None
+        self.thread = None
+
+    def start(self):
+        """
+            Returns False when this process does not run jobs or another process owns the queue.
+        """
+        if not self.run_jobs:
+            return False
+        with self.lock:
+            if self.thread is not None:
+                return True
+            os.makedirs(self.output_dir, exist_ok=True)
+            lock_file = open(os.path.join(self.output_dir, "jobs.lock"), "w")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+            self.lock_file = lock_file
+            self.thread = threading.Thread(target=self.run, name="pcap-jobs", daemon=True)
+            self.thread.start()
+            return True
+
+    def submit(self, filename, file_path):
+        job = PcapJob.objects.create(filename=filename, file_path=file_path)
+        self.start()
+        self.wakeup.set()
+        return job
+
+    def cancel(self, job_id):
+        """
+            Returns the job, or None when it does not exist. A queued job is cancelled right away,
+            a running one once the owner of the queue has stopped its tools.
+        """
+        if PcapJob.objects.filter(id=job_id, status="queued").update(
+                status="cancelled", cancel_requested=True, finished_at=timezone.now()):
+            return PcapJob.objects.get(id=job_id)
+        PcapJob.objects.filter(id=job_id, status="running").update(cancel_requested=True)
+        self.wakeup.set()
+        return PcapJob.objects.filter(id=job_id).first()
+
+    def recover(self):
+        # the tools run in sessions of their own, they outlive the process that started them
+        for job in PcapJob.objects.filter(status="running"):
+            for group in job.process_groups.values():
+                stop_process_group(group["pgid"], group["started"], self.kill_grace)
+        PcapJob.objects.filter(status="running").update(
+            status="queued", started_at=None, progress=0, steps={}, process_groups={})
+
+    def run(self):
+        try:
+            self.recover()
+        except Exception as ex:
+            print("Unable to requeue the interrupted pcap jobs", type(ex).__name__, ex)
+        while True:
+            try:
+                self.cancel_requested()
+                self.dispatch()
+            except Exception as ex:
+                print("Error while dispatching pcap jobs", type(ex).__name__, ex)
+            finally:
+                close_old_connections()
+            self.wakeup.wait(self.poll_interval)
+            self.wakeup.clear()
+
+    def dispatch(self):
+        while len(self.running) < self.workers:
+            job = PcapJob.objects.filter(status="queued").order_by("created_at", "id").first()
+            if job is None:
+                return
+            # the update only succeeds for one claimer
+            if not PcapJob.objects.filter(id=job.id, status="queued").update(
+                    status="running", started_at=timezone.now()):
+                continue
+            thread = threading.Thread(target=self.execute, args=(job.id,), name="pcap-job", daemon=True)
+            with self.lock:
+                self.running[job.id] = thread
+                self.cancel_events[job.id] = threading.Event()
+            thread.start()
+
+    def cancel_requested(self):
+        with self.lock:
+            running = list(self.running)
+        if not running:
+            return
+        for job_id in PcapJob.objects.filter(id__in=running, cancel_requested=True).values_list("id", flat=True):
+            with self.lock:
+                event = self.cancel_events.get(job_id)
+            if event is not None:
+                event.set()
+
+    def execute(self, job_id):
+        with self.lock:
+            cancelled = self.cancel_events[job_id]
+        results = {}
+        results_lock = threading.Lock()
+        try:
+            job = PcapJob.objects.get(id=job_id)
+            if not os.path.isfile(job.file_path):
+                raise FileNotFoundError("{} does not exist any more".format(job.filename))
+            job_dir = os.path.join(self.output_dir, str(job.id))
+            # leftovers of an interrupted run would mix with the new output
+            shutil.rmtree(job_dir, ignore_errors=True)
+            tools = analysis_tools(job.file_path, job_dir)
+            results.update({name: {"status": "running"} for name, _, _ in tools})
+            process_groups = {}
+            PcapJob.objects.filter(id=job_id).update(steps=results)
+
+            def record_process_group(name, process):
+                try:
+                    started = psutil.Process(process.pid).create_time()
+                except psutil.Error:
+                    return
+                with results_lock:
+                    process_groups[name] = {"pgid": process.pid, "started": started}
+                    PcapJob.objects.filter(id=job_id).update(process_groups=process_groups)
+
+            def run_tool(name, argv, output_dir):
+                # a result is stored whatever happens, the job waits for every tool to report one
+                try:
+                    result = self.run_tool(argv, output_dir, self.timeouts.get(name), cancelled,
+                                           on_start=lambda process: record_process_group(name, process))
+                except Exception as ex:
+                    print("Unable to run", name, "for pcap job", job_id, type(ex).__name__, ex)
+                    result = {"status": "failed", "error": "{} {}".format(type(ex).__name__, ex)}
+                with results_lock:
+                    results[name] = result
+                    finished = sum(1 for step in results.values() if step["status"] != "running")
+                    try:
+                        PcapJob.objects.filter(id=job_id).update(steps=results, progress=finished / len(results))
+                    except Exception as ex:
+                        print("Unable to save the progress of pcap job", job_id, type(ex).__name__, ex)
+                close_old_connections()
+
+            threads = [
+                threading.Thread(target=run_tool, args=tool, name="pcap-tool", daemon=True) for tool in tools
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            failed = [
+                "{}: {}".format(name, step.get("error", "stopped without a result"))
+                for name, step in results.items() if step["status"] != "done"
+            ]
+            if cancelled.is_set():
+                status, error = "cancelled", ""
+            elif failed:
+                status, error = "failed", "\n".join(failed)
+            else:
+                status, error = "done", ""
+        except Exception as ex:
+            print("Pcap job {} failed".format(job_id), type(ex).__name__, ex)
+            status, error = "failed", str(ex)
+        finally:
+            with self.lock:
+                self.running.pop(job_id, None)
+                self.cancel_events.pop(job_id, None)
+        PcapJob.objects.filter(id=job_id).update(
+            status=status, error=error, steps=results, process_groups={}, finished_at=timezone.now())
+        close_old_connections()
+        self.wakeup.set()
+
+    def run_tool(self, argv, output_dir, timeout, cancelled, on_start=None):
+        """
+            Runs `argv` in `output_dir` with its output in stdout.log and stderr.log there, and
+            returns its status (done, failed, timeout or cancelled), exit code, wall time and the
+            CPU time of the tool and the children it waited for. `on_start(process)` is called once
+            the tool is started.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        stdout_path = os.path.join(output_dir, "stdout.log")
+        stderr_path = os.path.join(output_dir, "stderr.log")
+        result = {"status": "failed", "exit_code": None, "wall_time": 0, "cpu_user": None, "cpu_system": None,
+                  "stdout": stdout_path, "stderr": stderr_path, "error": ""}
+        started = time.monotonic()
+        try:
+            with open(stdout_path, "wb") as stdout, open(stderr_path, "wb") as stderr:
+                # a process group of its own so stopping the tool also stops its children
+                process = subprocess.Popen(argv, cwd=output_dir, stdin=subprocess.DEVNULL, stdout=stdout,
+                                           stderr=stderr, start_new_session=True)
+        except OSError as ex:
+            result["error"] = "{} {}".format(type(ex).__name__, ex)
+            return result
+        if on_start is not None:
+            try:
+                on_start(process)
+            except Exception as ex:
+                print("Unable to record the process group of", argv[0], type(ex).__name__, ex)
+
+        deadline = started + timeout if timeout else None
+        stopped, kill_at = None, None
+        try:
+            while True:
+                # reaped here rather than by Popen.wait, which does not report the resource usage
+                pid, wait_status, usage = os.wait4(process.pid, os.WNOHANG)
+                if pid:
+                    break
+                now = time.monotonic()
+                if stopped is None and (cancelled.is_set() or (deadline and now >= deadline)):
+                    stopped = "cancelled" if cancelled.is_set() else "timeout"
+                    kill_at = now + self.kill_grace
+                    self.signal_group(process, signal.SIGTERM)
+                elif kill_at and now >= kill_at:
+                    self.signal_group(process, signal.SIGKILL)
+                    kill_at = None
+                time.sleep(0.1)
+        except BaseException:
+            # nobody would stop the tool any more
+            self.signal_group(process, signal.SIGKILL)
+            raise
+        process.returncode = (
+            -os.WTERMSIG(wait_status) if os.WIFSIGNALED(wait_status) else os.WEXITSTATUS(wait_status)
+        )
+
+        result.update({
+            "exit_code": process.returncode,
+            "wall_time": round(time.monotonic() - started, 3),
+            "cpu_user": round(usage.ru_utime, 3),
+            "cpu_system": round(usage.ru_stime, 3),
+        })
+        if stopped == "timeout":
+            result.update({"status": "timeout", "error": "stopped after {} seconds".format(timeout)})
+        elif stopped == "cancelled":
+            result.update({"status": "cancelled", "error": "cancelled"})
+        elif process.returncode != 0:
+            result["error"] = "exited with code {}: {}".format(process.returncode, log_tail(stderr_path))
+        else:
+            result["status"] = "done"
+        return result
+
+    def signal_group(self, process, signum):
+        try:
+            os.killpg(process.pid, signum)
+        except ProcessLookupError:
+            pass
@@ -0,0 +1,88 @@
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class RestartJobs:
+    """
+        Restarts containers in the background, `concurrency` of them at a time.
+
+        `submit` returns a job right away. Each container of the job goes from pending to
+        restarting and ends as done or failed, with its own start time and duration. Only the
+        `max_jobs` most recent jobs are kept.
+    """
+
+    def __init__(self, inventory, concurrency=4, restart_timeout=10, max_jobs=100):
+        self.inventory = inventory
+        self.restart_timeout = restart_timeout
+        self.max_jobs = max_jobs
+        self.pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="container-restart")
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, container_ids):
+        job = {
+            "id": uuid.uuid4().hex,
+            "created_at": time.time(),
+            "containers": [
+                {
+                    "id": str(container_id),
+                    "name": None,
+                    "status": "pending",
+                    "started_at": None,
+                    "duration": None,
+                    "error": None,
+                }
+                for container_id in container_ids
+            ],
+        }
+        with self.lock:
+            self.jobs[job["id"]] = job
+            while len(self.jobs) > self.max_jobs:
+                self.jobs.popitem(last=False)
+        for entry in job["containers"]:
+            self.pool.submit(self.restart, entry)
+        return self.get(job["id"])
+
+    def update(self, entry, **values):
+        with self.lock:
+            entry.update(values)
+
+    def restart(self, entry):
+        started = time.monotonic()
+        self.update(entry, status="restarting", started_at=time.time())
+        try:
+            self.inventory.wait_ready(self.restart_timeout)
+            container = self.inventory.get(entry["id"])
+            if container is None:
+                raise LookupError("No container with the id '{}' was found.".format(entry["id"]))
+            self.update(entry, name=container.name)
+            print(f"Restarting container: {container.name}")
+            container.restart(timeout=self.restart_timeout)
+            print(f"Container {container.name} has been restarted successfully.")
+            self.update(entry, status="done", duration=round(time.monotonic() - started, 3))
+        except Exception as ex:
+            print(f"An error occurred while trying to restart the container '{entry['id']}': {ex}")
+            self.update(entry, status="failed", error=str(ex), duration=round(time.monotonic() - started, 3))
+
+    def get(self, job_id):
+        """
+            Returns a copy of the job with its overall status, or None for an unknown job.
+        """
+        with self.lock:
+            job = copy.deepcopy(self.jobs.get(job_id))
+        if job is None:
+            return None
+        statuses = set(entry["status"] for entry in job["containers"])
+        if statuses <= {"pending"}:
+            job["status"] = "pending"
+        elif statuses & {"pending", "restarting"}:
+            job["status"] = "restarting"
+        elif "failed" in statuses:
+            job["status"] = "failed"
+        else:
+            job["status"] = "done"
+        return job
@@ -0,0 +1,80 @@
+from django.conf import settings
+
+from elastic_search_api_new.settings import es_url
+
+
+class BootstrapError(Exception):
+    pass
+
+
+def policy_name():
+    return settings.SYSTEM_DATA_STREAM + "-policy"
+
+
+def ilm_policy_body():
+    """
+        Roll the write index over on size or age, delete generations once they are older than the
+        retention period.
+    """
+    return {
+        "policy": {
+            "phases": {
+                "hot": {
+                    "actions": {
+                        "rollover": {
+                            "max_primary_shard_size": settings.ROLLOVER_MAX_PRIMARY_SHARD_SIZE,
+                            "max_age": settings.ROLLOVER_MAX_AGE,
+                        }
+                    }
+                },
+                "delete": {
+                    "min_age": "{}d".format(settings.ROLLOVER_RETENTION_DAYS),
+                    "actions": {"delete": {}},
+                },
+            }
+        }
+    }
+
+
+def index_template_body():
+    return {
+        "index_patterns": [settings.SYSTEM_DATA_STREAM],
+        "data_stream": {},
+        # above the filebeat-* templates so this template wins for the SystemData stream
+        "priority": 500,
+        "template": {
+            "settings": {
+                "index.lifecycle.name": policy_name(),
+            },
+            "mappings": {
+                "properties": {
+                    # SystemData stamps @timestamp in epoch seconds
+                    "@timestamp": {"type": "date", "format": "strict_date_optional_time||epoch_second"},
+                }
+            },
+        },
+    }
+
+
+def bootstrap(log=print):
+    """
+        Create or update the lifecycle policy and the index template, then create the data stream
+        if it does not exist yet. Safe to run again after changing the rollover settings. Raises
+        `BootstrapError` when a concrete index or alias already has the data stream's name.
+    """
+    es_url.ilm.put_lifecycle(name=policy_name(), body=ilm_policy_body())
+    log("Lifecycle policy {} is up to date".format(policy_name()))
+
+    es_url.indices.put_index_template(name=settings.SYSTEM_DATA_STREAM, body=index_template_body())
+    log("Index template {} is up to date".format(settings.SYSTEM_DATA_STREAM))
+
+    res = es_url.options(ignore_status=404).indices.get_data_stream(name=settings.SYSTEM_DATA_STREAM)
+    if res.body.get("data_streams"):
+        log("Data stream {} already exists".format(settings.SYSTEM_DATA_STREAM))
+    elif es_url.indices.exists(index=settings.SYSTEM_DATA_STREAM):
+        # a plain index or an alias of that name would take the writes instead of the data stream
+        raise BootstrapError("{} is an index or alias, not a data stream: reindex it into a data stream "
+                             "or delete it, then run the bootstrap again".format(settings.SYSTEM_DATA_STREAM))
+    else:
+        es_url.indices.create_data_stream(name=settings.SYSTEM_DATA_STREAM)
+        log("Data stream {} created".format(settings.SYSTEM_DATA_STREAM))
@@ -0,0 +1,270 @@
+import fcntl
+import json
+import os
+import threading
+import time
+import uuid
+
+from .ingest import IngestBatchTicket
+
+segment_prefix = "segment-"
+segment_suffix = ".ndjson"
+
+
+class SpoolUnavailable(Exception):
+    pass
+
+
+class SpoolLocked(SpoolUnavailable):
+    """
+        Raised when another process holds the spool directory, every process needs its own INGEST_SPOOL_DIR.
+    """
+
+
+def segment_name(sequence):
+    return "{}{:012d}{}".format(segment_prefix, sequence, segment_suffix)
+
+
+class IngestSpool:
+    """
+        Durable, append-only write-ahead spool in front of the bulk ingester.
+
+        Events are appended as JSON lines to numbered segment files in `directory` and `append`
+        only returns once they are fsync'd, so an acknowledged event survives a crash or an
+        Elasticsearch outage. Concurrent appends share fsyncs (group commit). A segment is closed
+        once it grows past `segment_bytes`.
+
+        A background shipper reads the segments from the checkpoint, sends `batch_docs` records at a
+        time through `ingester.flush_batch` and moves the checkpoint only once a batch is written.
+        Every record carries an id that is used as the document `_id`, so batches replayed after a
+        restart or a failed flush do not create duplicates. Fully shipped segments are deleted.
+
+        The spool belongs to one process: `start` takes an exclusive lock on the directory and only
+        the process holding it appends and ships, the others get `SpoolLocked`. Give every server
+        process its own directory.
+    """
+
+    def __init__(self, directory, ingester, segment_bytes=64 * 1024 * 1024, batch_docs=1000, retry_interval=5):
+        self.directory = directory
+        self.ingester = ingester
+        self.segment_bytes = segment_bytes
+        self.batch_docs = batch_docs
+        self.retry_interval = retry_interval
+        self.checkpoint_path = os.path.join(directory, "checkpoint.json")
+        self.write_lock = threading.Lock()
+        self.sync_lock = threading.Lock()
+        self.start_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.lock_file = None
+        self.file = None
+        self.segment = 0
+        self.written = (0, 0)
+        self.synced = (0, 0)
+        self.pending = 0
+        self.head_ts = None
+        self.shipped = 0
+        self.dropped = 0
+        self.thread = None
+
+    def segments(self):
+        sequences = []
+        for name in os.listdir(self.directory):
+            if name.startswith(segment_prefix) and name.endswith(segment_suffix):
+                sequences.append(int(name[len(segment_prefix):-len(segment_suffix)]))
+        return sorted(sequences)
+
+    def segment_path(self, sequence):
+        return os.path.join(self.directory, segment_name(sequence))
+
+    def read_checkpoint(self):
+        try:
+            with open(self.checkpoint_path) as checkpoint:
+                data = json.load(checkpoint)
+            return data["segment"], data["offset"]
+        except (OSError, ValueError, KeyError):
+            segments = self.segments()
+            return (segments[0] if segments else 0), 0
+
+    def write_checkpoint(self, sequence, offset):
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as checkpoint:
+            json.dump({"segment": sequence, "offset": offset}, checkpoint)
+        # a lost checkpoint only replays already shipped records, which are deduplicated by id
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def start(self):
+        with self.start_lock:
+            if self.thread is not None:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            lock_file = open(os.path.join(self.directory, "lock"), "w")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                raise SpoolLocked("spool {} is owned by another process".format(self.directory))
+            self.lock_file = lock_file
+            self.open_writer()
+            self.pending = self.count_pending()
+            self.thread = threading.Thread(target=self.run, name="ingest-spool", daemon=True)
+            self.thread.start()
+
+    def open_writer(self):
+        segments = self.segments()
+        self.segment = segments[-1] if segments else self.read_checkpoint()[0]
+        path = self.segment_path(self.segment)
+        if os.path.exists(path):
+            # drop a torn last line left by a crash in the middle of a write
+            with open(path, "rb+") as segment:
+                data = segment.read()
+                end = data.rfind(b"\n") + 1
+                if end != len(data):
+                    segment.truncate(end)
+        self.file = open(path, "ab")
+        self.written = self.synced = (self.segment, self.file.tell())
+
+    def count_pending(self):
+        sequence, offset = self.read_checkpoint()
+        pending = 0
+        for segment in self.segments():
+            if segment < sequence:
+                continue
+            with open(self.segment_path(segment), "rb") as reader:
+                if segment == sequence:
+                    reader.seek(offset)
+                pending += sum(1 for line in reader if line.endswith(b"\n"))
+        return pending
+
+    def append(self, index, doc):
+        self.append_many([(index, doc)])
+
+    def append_many(self, events):
+        """
+            Append (index, doc) pairs and return once they are on disk.
+        """
+        self.start()
+        now = time.time()
+        data = b"".join(
+            json.dumps({"id": uuid.uuid4().hex, "index": index, "ts": now, "doc": doc}, default=str).encode("utf-8")
+            + b"\n"
+            for index, doc in events
+        )
+        with self.write_lock:
+            if self.file.tell() >= self.segment_bytes:
+                self.rotate()
+            self.file.write(data)
+            self.file.flush()
+            self.written = my_end = (self.segment, self.file.tell())
+            self.pending += len(events)
+        with self.sync_lock:
+            if self.synced < my_end:
+                written = self.written
+                os.fsync(self.file.fileno())
+                self.synced = written
+        self.wakeup.set()
+
+    def rotate(self):
+        with self.sync_lock:
+            os.fsync(self.file.fileno())
+            self.file.close()
+            self.segment += 1
+            self.file = open(self.segment_path(self.segment), "ab")
+            self.synced = (self.segment, 0)
+
+    def read_batch(self, sequence, offset):
+        """
+            Returns (records, next_sequence, next_offset) starting at the given position, moving on to
+            the next segment once a closed segment has been read to its end.
+        """
+        records = []
+        while len(records) < self.batch_docs:
+            path = self.segment_path(sequence)
+            if not os.path.exists(path):
+                if sequence < self.segment:
+                    sequence, offset = sequence + 1, 0
+                    continue
+                break
+            with open(path, "rb") as reader:
+                reader.seek(offset)
+                while len(records) < self.batch_docs:
+                    line = reader.readline()
+                    if not line.endswith(b"\n"):
+                        break
+                    offset += len(line)
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        print("Skipping unreadable spool record in", path)
+                        self.dropped += 1
+            if len(records) < self.batch_docs and sequence < self.segment:
+                sequence, offset = sequence + 1, 0
+                continue
+            break
+        return records, sequence, offset
+
+    def run(self):
+        sequence, offset = self.read_checkpoint()
+        while True:
+            try:
+                records, next_sequence, next_offset = self.read_batch(sequence, offset)
+                self.head_ts = records[0]["ts"] if records else None
+                if not records:
+                    if (next_sequence, next_offset) != (sequence, offset):
+                        self.advance(sequence, next_sequence, next_offset)
+                        sequence, offset = next_sequence, next_offset
+                        continue
+                    self.wakeup.wait(1)
+                    self.wakeup.clear()
+                    continue
+
+                ticket = IngestBatchTicket()
+                items = []
+                for record in records:
+                    ticket.add()
+                    items.append((record["index"], record["doc"], ticket, 0, record["id"]))
+                ticket.close()
+                self.ingester.flush_batch(items)
+                if ticket.retryable:
+                    print("Elasticsearch rejected the spool batch, retrying in", self.retry_interval, "seconds")
+                    time.sleep(self.retry_interval)
+                    continue
+
+                self.shipped += ticket.accepted
+                self.dropped += ticket.failed
+                with self.write_lock:
+                    self.pending = max(self.pending - len(records), 0)
+                self.advance(sequence, next_sequence, next_offset)
+                sequence, offset = next_sequence, next_offset
+            except Exception as ex:
+                print("Error while shipping the spool", type(ex).__name__, ex)
+                time.sleep(self.retry_interval)
+
+    def advance(self, sequence, next_sequence, next_offset):
+        self.write_checkpoint(next_sequence, next_offset)
+        for segment in range(sequence, next_sequence):
+            try:
+                os.remove(self.segment_path(segment))
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        depth_bytes = 0
+        if self.thread is not None:
+            sequence, offset = self.read_checkpoint()
+            for segment in self.segments():
+                if segment >= sequence:
+                    try:
+                        depth_bytes += os.path.getsize(self.segment_path(segment))
+                    except FileNotFoundError:
+                        pass
+            depth_bytes = max(depth_bytes - offset, 0)
+        head_ts = self.head_ts
+        return {
+            "running": self.thread is not None,
+            "depth": self.pending,
+            "depth_bytes": depth_bytes,
+            "lag_seconds": round(time.time() - head_ts, 3) if head_ts else 0,
+            "shipped": self.shipped,
+            "dropped": self.dropped,
+            "segment": self.segment,
+        }
@@ -1,3 +1,413 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from asgiref.sync import async_to_sync
+from unittest import mock
+
+from django.contrib.auth.models import User
+from rest_framework.test import APIRequestFactory, force_authenticate
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase
+
+from elastic_search_api_new.query_builder import build_query, build_search, prefix_filter, phrase_filter, \
+    match_filter, ids_filter, range_filter, hits_filter_path, build_aggregation, terms_agg, date_histogram_agg, \
+    composite_agg
+from .views import build_data_query, build_data_search, AggregateData
+from .pagination import read_page
+from . import ingest
+from .ingest import BulkIngester, IngestBatchTicket, IngestTicket
+from .spool import IngestSpool, segment_name
+from elastic_search_api_new.single_flight import AsyncSingleFlight
+from elastic_search_api_new import search_cache as search_cache_module
+from elastic_search_api_new.search_cache import SearchCache
+from elastic_search_api_new.async_api import AsyncAPIView, sign_query_token
+from .metrics_history import MetricSeries, RingBuffer
+from .async_views import AsyncMetricsStream, metrics_broadcaster
+
 
 # Create your tests here.
+class QueryBuilderTests(SimpleTestCase):
+    def test_clause_builders_skip_empty_values(self):
+        self.assertIsNone(prefix_filter("hostname", ""))
+        self.assertIsNone(phrase_filter("email", None))
+        self.assertIsNone(match_filter("email", ""))
+        self.assertIsNone(ids_filter(None))
+        self.assertIsNone(range_filter("@timestamp"))
+
+    def test_clause_builders(self):
+        self.assertEqual(prefix_filter("hostname", "web"), {"match_phrase_prefix": {"hostname": "web"}})
+        self.assertEqual(phrase_filter("role_name", "admin"), {"match_phrase": {"role_name": "admin"}})
+        self.assertEqual(match_filter("email", "a@b.c"), {"match": {"email": "a@b.c"}})
+        self.assertEqual(ids_filter("abc", 12), {"ids": {"values": ["abc", "12"]}})
+        self.assertEqual(range_filter("@timestamp", gte="now-1h"), {"range": {"@timestamp": {"gte": "now-1h"}}})
+        self.assertEqual(
+            range_filter("@timestamp", gte="now-1h", lte="now"),
+            {"range": {"@timestamp": {"gte": "now-1h", "lte": "now"}}},
+        )
+
+    def test_build_query_without_filters_is_match_all(self):
+        self.assertEqual(build_query(), {"match_all": {}})
+        self.assertEqual(build_query([None, prefix_filter("hostname", "")]), {"match_all": {}})
+
+    def test_build_query_puts_constraints_in_filter_context(self):
+        query = build_query([prefix_filter("hostname", "web"), None, ids_filter("abc")])
+        self.assertEqual(query, {
+            "bool": {
+                "filter": [
+                    {"match_phrase_prefix": {"hostname": "web"}},
+                    {"ids": {"values": ["abc"]}},
+                ]
+            }
+        })
+        self.assertNotIn("must", query["bool"])
+
+    def test_build_search_pages_by_size(self):
+        body = build_search({"match_all": {}}, size=25, page=3)
+        self.assertEqual(body, {
+            "query": {"match_all": {}},
+            "size": 25,
+            "from": 75,
+            "sort": ["_doc"],
+            "track_total_hits": False,
+        })
+
+    def test_build_search_projection_sort_and_totals(self):
+        body = build_search(
+            {"match_all": {}},
+            size=1,
+            source=["host"],
+            sort=[{"@timestamp": "desc"}],
+            track_total_hits=True,
+        )
+        self.assertEqual(body["_source"], ["host"])
+        self.assertEqual(body["sort"], [{"@timestamp": "desc"}])
+        self.assertTrue(body["track_total_hits"])
+        self.assertEqual(build_search({"match_all": {}}, source=False)["_source"], False)
+
+    def test_hits_filter_path(self):
+        self.assertEqual(hits_filter_path(), ["hits.hits._id", "hits.hits._source"])
+        self.assertEqual(hits_filter_path([]), ["hits.hits._id"])
+        self.assertEqual(
+            hits_filter_path(["name", "email"]),
+            ["hits.hits._id", "hits.hits._source.name", "hits.hits._source.email"],
+        )
+
+    def test_build_aggregation_skips_hits(self):
+        self.assertEqual(build_aggregation({"match_all": {}}, {"data": terms_agg("hostname.keyword", 5)}), {
+            "query": {"match_all": {}},
+            "size": 0,
+            "track_total_hits": False,
+            "aggs": {"data": {"terms": {"field": "hostname.keyword", "size": 5}}},
+        })
+
+    def test_date_histogram_agg(self):
+        self.assertEqual(
+            date_histogram_agg("@timestamp", "5m"),
+            {"date_histogram": {"field": "@timestamp", "fixed_interval": "5m", "min_doc_count": 1}},
+        )
+
+    def test_composite_agg(self):
+        self.assertEqual(composite_agg("hostname", "hostname.keyword", 50), {
+            "composite": {"size": 50, "sources": [{"hostname": {"terms": {"field": "hostname.keyword"}}}]}
+        })
+        self.assertEqual(
+            composite_agg("hostname", "hostname.keyword", after="web-01")["composite"]["after"],
+            {"hostname": "web-01"},
+        )
+
+    def test_build_data_query(self):
+        self.assertEqual(build_data_query(), {"match_all": {}})
+        self.assertEqual(build_data_query("web", "now-1d", "now"), {
+            "bool": {
+                "filter": [
+                    {"match_phrase_prefix": {"hostname": "web"}},
+                    {"range": {"@timestamp": {"gte": "now-1d", "lte": "now"}}},
+                ]
+            }
+        })
+
+    def test_build_data_query_reads_epoch_seconds_like_the_resolver(self):
+        self.assertEqual(build_data_query("", "1700000000", "1700003600000"), {
+            "bool": {
+                "filter": [
+                    {"range": {"@timestamp": {
+                        "gte": 1700000000000,
+                        "lte": 1700003600000,
+                        "format": "strict_date_optional_time||epoch_millis",
+                    }}},
+                ]
+            }
+        })
+        self.assertEqual(
+            build_data_query("", "1700000000", "now")["bool"]["filter"][0]["range"]["@timestamp"]["lte"], "now")
+
+    def test_build_data_search_rejects_empty_pages(self):
+        with self.assertRaises(ValueError):
+            build_data_search({"size": "0"})
+
+    def test_empty_page_is_the_last_page(self):
+        self.assertEqual(read_page({"hits": {"hits": []}}, 0, "pit"), ([], "pit", True))
+        self.assertEqual(read_page({"pit_id": "next", "hits": {"hits": [{}]}}, 1, "pit"), ([{}], "next", False))
+
+
+class MetricsHistoryTests(SimpleTestCase):
+    def test_ring_buffer_downsamples_and_wraps(self):
+        ring = RingBuffer(10, 3, ["cpu_percent", "net_rx"])
+        for timestamp in range(0, 50):
+            ring.add(float(timestamp), [float(timestamp % 10), float(timestamp)])
+        timestamps, columns = ring.range(0, 100)
+        # the oldest of the four full buckets was overwritten, the last one is still being filled
+        self.assertEqual(timestamps, [10.0, 20.0, 30.0, 40.0])
+        self.assertEqual(columns[0], [4.5, 4.5, 4.5, 4.5])
+        self.assertEqual(columns[1], [19.0, 29.0, 39.0, 49.0])
+
+    def test_series_reads_from_the_finest_tier_holding_the_start(self):
+        series = MetricSeries(["cpu_percent"], [(1, 10), (5, 10)])
+        for timestamp in range(0, 30):
+            series.add(float(timestamp), {"cpu_percent": 1})
+        step, timestamps, columns = series.range(25, 29)
+        self.assertEqual((step, timestamps), (1, [25.0, 26.0, 27.0, 28.0, 29.0]))
+        step, timestamps, columns = series.range(5, 29)
+        self.assertEqual((step, timestamps), (5, [5.0, 10.0, 15.0, 20.0, 25.0]))
+        self.assertEqual(columns["cpu_percent"], [1.0] * 5)
+
+
+class AsyncSingleFlightTests(SimpleTestCase):
+    def test_calls_on_different_loops_do_not_share_a_task(self):
+        flight = AsyncSingleFlight()
+        started = threading.Barrier(2)
+        results = []
+
+        async def search():
+            await asyncio.sleep(0.05)
+            return threading.get_ident()
+
+        async def requests():
+            return await asyncio.gather(flight.do("key", search), flight.do("key", search))
+
+        def run_loop():
+            loop = asyncio.new_event_loop()
+            try:
+                loop.run_until_complete(asyncio.sleep(0))
+                started.wait()
+                results.append(loop.run_until_complete(requests()))
+            finally:
+                loop.close()
+
+        threads = [threading.Thread(target=run_loop) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), 2)
+        # both awaits of a loop got the result of its own task
+        for first, second in results:
+            self.assertEqual(first, second)
+        self.assertNotEqual(results[0][0], results[1][0])
+        self.assertEqual(flight.stats(), {"executed": 2, "shared": 2, "in_flight": 0})
+
+
+class AsyncAPIViewTests(SimpleTestCase):
+    def test_wsgi_requests_are_refused(self):
+        class View(AsyncAPIView):
+            authentication_required = False
+
+            async def get(self, request):
+                raise AssertionError("must not run under WSGI")
+
+        response = async_to_sync(View.as_view())(RequestFactory().get("/async/view"))
+        self.assertEqual(response.status_code, 404)
+
+
+class MetricsStreamAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("dashboard", password="secret")
+
+    async def open_stream(self, query):
+        request = AsyncRequestFactory().get("/async/system/metrics/stream", query)
+        # the samplers behind the broadcaster are not needed to open the stream
+        with mock.patch.object(metrics_broadcaster, "start"):
+            return await AsyncMetricsStream.as_view()(request)
+
+    async def test_stream_opens_with_a_signed_token_instead_of_the_header(self):
+        response = await self.open_stream({"token": sign_query_token(self.user)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = response.streaming_content
+        self.assertEqual(await events.__anext__(), b"retry: 1000\n\n")
+        await events.aclose()
+        metrics_broadcaster.subscribers.clear()
+
+    async def test_stream_refuses_missing_and_forged_tokens(self):
+        self.assertEqual((await self.open_stream({})).status_code, 401)
+        token = sign_query_token(self.user)
+        self.assertEqual((await self.open_stream({"token": token + "x"})).status_code, 401)
+
+
+class SearchCacheTests(SimpleTestCase):
+    def test_result_read_before_an_invalidation_is_not_stored(self):
+        cache = SearchCache(10, {"default": 60})
+        key = cache.make_key("users", {"query": {"match_all": {}}})
+        generation = cache.current_generation()
+        # a write lands while the search is in flight
+        cache.invalidate("users")
+        cache.put(key, {"hits": "old"}, generation)
+        self.assertIsNone(cache.get(key))
+        cache.put(key, {"hits": "new"}, cache.current_generation())
+        self.assertEqual(cache.get(key), {"hits": "new"})
+
+    def test_invalidation_of_another_index_keeps_the_result(self):
+        cache = SearchCache(10, {"default": 60})
+        key = cache.make_key("users", {"query": {"match_all": {}}})
+        generation = cache.current_generation()
+        cache.invalidate("roles")
+        cache.put(key, {"hits": []}, generation)
+        self.assertEqual(cache.get(key), {"hits": []})
+
+    def test_ranged_result_is_invalidated_by_a_write_to_the_data_stream(self):
+        cache = SearchCache(10, {"default": 5, "filebeat-*": 60})
+        body = {"query": {"range": {"@timestamp": {"gte": 0}}}}
+        resolved = "filebeat-systemdata,.ds-filebeat-systemdata-2026.10.18-000001"
+        with mock.patch.object(search_cache_module, "search_cache", cache), \
+                mock.patch.object(search_cache_module, "es_url") as es:
+            es.search.return_value = {"hits": {"hits": []}}
+            search_cache_module.cached_search(resolved, body, cache_index="filebeat-*")
+            es.search.assert_called_once_with(index=resolved, body=body, filter_path=None)
+        key = cache.make_key("filebeat-*", body)
+        self.assertEqual(cache.ttl_for(key[0]), 60)
+        self.assertIsNotNone(cache.get(key))
+        cache.invalidate("filebeat-systemdata")
+        self.assertIsNone(cache.get(key))
+
+        cache.put(key, {"hits": []})
+        cache.invalidate(".ds-filebeat-systemdata-2026.10.18-000002")
+        self.assertIsNone(cache.get(key))
+
+
+class AggregateDataTests(SimpleTestCase):
+    def get(self, **params):
+        request = APIRequestFactory().get("/aggregate", params)
+        force_authenticate(request, user=User(username="admin"))
+        return AggregateData.as_view()(request)
+
+    def test_invalid_size_and_interval_are_rejected(self):
+        for params in ({"size": "ten"}, {"size": "-5"}, {"size": "0"},
+                       {"type": "histogram", "interval": "1 minute"}, {"type": "histogram", "interval": "0m"}):
+            response = self.get(**params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn("message", json.loads(response.content))
+
+
+class BulkIngesterTests(SimpleTestCase):
+    def item(self, status, error=None):
+        result = {"status": status}
+        if error:
+            result["error"] = {"type": error}
+        return {"create": result}
+
+    def test_rejected_items_are_retried_with_backoff(self):
+        ingester = BulkIngester(max_retries=3, retry_backoff=0.5)
+        tickets = [IngestTicket(), IngestTicket()]
+        batch = [("logs", {"n": n}, ticket, 1, None) for n, ticket in enumerate(tickets)]
+        with mock.patch.object(ingest, "es_url") as es, mock.patch.object(ingest.time, "sleep") as sleep:
+            es.bulk.side_effect = [
+                {"items": [self.item(201), self.item(429)]},
+                {"items": [self.item(429)]},
+                {"items": [self.item(201)]},
+            ]
+            ingester.flush_batch(batch)
+        self.assertEqual([len(c.kwargs["body"]) for c in es.bulk.call_args_list], [4, 2, 2])
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [0.5, 1.0])
+        self.assertTrue(all(ticket.wait(0) for ticket in tickets))
+        self.assertEqual(ingester.stats()["retried"], 2)
+
+    def test_retries_give_up_after_max_retries(self):
+        ingester = BulkIngester(max_retries=1, retry_backoff=0)
+        ticket = IngestBatchTicket()
+        ticket.add()
+        ticket.close()
+        with mock.patch.object(ingest, "es_url") as es, mock.patch.object(ingest.time, "sleep"):
+            es.bulk.return_value = {"items": [self.item(429)]}
+            ingester.flush_batch([("logs", {}, ticket, 1, None)])
+        self.assertEqual(es.bulk.call_count, 2)
+        self.assertEqual((ticket.failed, ticket.retryable), (1, 1))
+
+    def test_conflict_counts_as_accepted_only_with_a_doc_id(self):
+        ingester = BulkIngester()
+        replayed, posted = IngestTicket(), IngestTicket()
+        with mock.patch.object(ingest, "es_url") as es:
+            es.bulk.return_value = {"items": [self.item(409, "version_conflict_engine_exception")] * 2}
+            ingester.flush_batch([("logs", {}, replayed, 1, "seg-1:0"), ("logs", {}, posted, 1, None)])
+        self.assertEqual(es.bulk.call_args.kwargs["body"][0], {"create": {"_index": "logs", "_id": "seg-1:0"}})
+        self.assertTrue(replayed.wait(0))
+        self.assertFalse(posted.wait(0))
+        self.assertEqual(posted.error, "version_conflict_engine_exception")
+
+    def test_batch_ticket_completes_once_closed_and_every_document_resolved(self):
+        ingester = BulkIngester(max_docs=2, flush_interval=60)
+        ticket = IngestBatchTicket()
+        with mock.patch.object(ingest, "es_url") as es:
+            es.bulk.side_effect = lambda body, filter_path: {"items": [self.item(201)] * (len(body) // 2)}
+            for n in range(3):
+                ingester.submit("logs", {"n": n}, ticket=ticket)
+            self.assertFalse(ticket.wait(0.2))
+            ingester.flush()
+            self.assertFalse(ticket.wait(0.2))
+            ticket.close()
+            self.assertTrue(ticket.wait(5))
+            ingester.close()
+        self.assertEqual((ticket.submitted, ticket.accepted, ticket.failed), (3, 3, 0))
+
+
+class IngestSpoolTests(SimpleTestCase):
+    class Ingester:
+        def __init__(self):
+            self.shipped = []
+            self.flushed = threading.Event()
+
+        def flush_batch(self, batch):
+            for index, doc, ticket, _, doc_id in batch:
+                self.shipped.append(doc_id)
+                ticket.resolve(True)
+            self.flushed.set()
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write_segment(self, sequence, records, tail=b""):
+        lines = b"".join(
+            json.dumps({"id": doc_id, "index": "logs", "ts": 0, "doc": {}}).encode("utf-8") + b"\n"
+            for doc_id in records
+        )
+        with open(os.path.join(self.directory, segment_name(sequence)), "wb") as segment:
+            segment.write(lines + tail)
+        return len(lines)
+
+    def test_replay_starts_at_the_checkpoint(self):
+        self.write_segment(0, ["a", "b"])
+        offset = len(json.dumps({"id": "c", "index": "logs", "ts": 0, "doc": {}})) + 1
+        self.write_segment(1, ["c", "d", "e"])
+        spool = IngestSpool(self.directory, self.Ingester())
+        spool.write_checkpoint(1, offset)
+        self.assertEqual(spool.count_pending(), 2)
+
+        spool.start()
+        self.assertTrue(spool.ingester.flushed.wait(5))
+        self.assertEqual(spool.ingester.shipped, ["d", "e"])
+        for _ in range(50):
+            if spool.read_checkpoint() != (1, offset):
+                break
+            time.sleep(0.1)
+        self.assertEqual(spool.read_checkpoint(), (1, offset * 3))
+        self.assertEqual(spool.stats()["depth"], 0)
+
+    def test_count_pending_skips_a_partial_last_line(self):
+        self.write_segment(0, ["a", "b"], tail=b'{"id": "c", "ind')
+        spool = IngestSpool(self.directory, self.Ingester())
+        self.assertEqual(spool.count_pending(), 2)
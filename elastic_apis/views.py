@@ -1,76 +1,243 @@
 from rest_framework.views import APIView
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from elastic_search_api_new.settings import es_url
+from elastic_search_api_new.search_cache import cached_search, search_cache
+from elastic_search_api_new.single_flight import search_flight, async_search_flight
+from elastic_search_api_new.metrics import registry
+from elastic_search_api_new.async_api import sign_query_token
 import os, sys
+import re
+import io
 import psutil
-import docker
 from bson.objectid import ObjectId
 from datetime import datetime, timedelta
 import time
+import json
+import itertools
+from concurrent.futures import ThreadPoolExecutor, wait
+from elastic_search_api_new.query_builder import build_query, build_search, prefix_filter, range_filter, \
+    hits_filter_path, build_aggregation, terms_agg, date_histogram_agg, composite_agg
+from elastic_search_api_new.list_searches import build_role_search, format_role_hit, role_fields, build_user_search, format_user_hit, \
+    user_fields
 from .forms import FileUploadForm
+from .pagination import search_page, iter_pages, InvalidCursor
+from .index_resolver import IndexResolver, parse_time
+from .hostname_index import HostnameIndex
+from .ingest import BulkIngester, IngestBatchTicket
+from .spool import IngestSpool, SpoolUnavailable, SpoolLocked
+from .docker_metrics import format_container_stats, container_stats_fields, collect_container_stats
+from .container_sampler import ContainerSampler
+from .docker_inventory import DockerInventory
+from .restart_jobs import RestartJobs
+from .metrics_history import MetricsHistory
+from .host_metrics import HostSampler, DiskProber
+from .exposition import host_families, container_families
+from .metrics_stream import MetricsBroadcaster
+from .pcap_jobs import PcapJobQueue, format_job
+from .models import PcapJob
+from django.conf import settings
 from rest_framework.permissions import IsAuthenticated  # <-- Here
 
 # Define the index name
 index_name = "filebeat-*"
-zeek_command_base = "zeek -C -r"
-suricata_command_base = "suricata -r"
-
-
-# Function to run commands
-def run_command(command):
-    try:
-        subprocess.run(command, shell=True, check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"Error executing command: {command}\nError: {e}")
-
-
-# Function to calculate CPU percentage
-def calculate_cpu_percent(d):
-    print(d["cpu_stats"])
+# Data stream the SystemData documents are written to (see rollover.py)
+write_index_name = settings.SYSTEM_DATA_STREAM
+
+# Narrows time range queries down to the filebeat indices that can hold matching documents
+index_resolver = IndexResolver(
+    index_name,
+    refresh_interval=settings.INDEX_RESOLVER_REFRESH_INTERVAL,
+    stable_after=settings.INDEX_RESOLVER_STABLE_AFTER,
+)
+
+# Buffers the documents posted to SystemData and writes them with the bulk api
+bulk_ingester = BulkIngester(
+    max_docs=settings.INGEST_BULK_MAX_DOCS,
+    max_bytes=settings.INGEST_BULK_MAX_BYTES,
+    flush_interval=settings.INGEST_BULK_FLUSH_INTERVAL,
+    max_retries=settings.INGEST_BULK_MAX_RETRIES,
+    max_buffered=settings.INGEST_BULK_MAX_BUFFERED,
+    on_flush=lambda batch: [search_cache.invalidate(index) for index in set(item[0] for item in batch)],
+)
+
+# Durable spool in front of the bulk ingester, only used when INGEST_SPOOL_DIR is set
+ingest_spool = None
+if settings.INGEST_SPOOL_DIR:
+    ingest_spool = IngestSpool(
+        settings.INGEST_SPOOL_DIR,
+        bulk_ingester,
+        segment_bytes=settings.INGEST_SPOOL_SEGMENT_BYTES,
+        batch_docs=settings.INGEST_SPOOL_BATCH_DOCS,
+    )
+
+
+# Function to write events through the spool when it is available, returns False when it is not
+def spool_events(events):
+    if ingest_spool is None:
+        return False
     try:
-        cpu_count = d["cpu_stats"]["online_cpus"]
-    except:
-        cpu_count = 0
-    cpu_percent = 0.0
-    try:
-        precpu_stats = float(d["precpu_stats"]["cpu_usage"]["total_usage"])
-    except:
-        precpu_stats = 0
-
-    try:
-        system_cpu_usage = float(d["precpu_stats"]["system_cpu_usage"])
-    except:
-        system_cpu_usage = 0
-
-
-    cpu_delta = float(d["cpu_stats"]["cpu_usage"]["total_usage"]) - float(precpu_stats)
-    system_delta = float(d["cpu_stats"]["system_cpu_usage"]) - system_cpu_usage
-
-    print("system_delta", system_delta)
-    print("cpu_delta", cpu_delta)
-
-    if system_delta > 0.0 and cpu_delta > 0.0:
-        try:
-            cpu_percent = round((cpu_delta / system_delta) * cpu_count * 100.0, 2)
-        except:
-            cpu_percent = 0
-    return cpu_percent
-
-
-# Function to get network I/O
-def get_network_io(d):
-    networks = d["networks"] if "networks" in d else {}
-    total_rx, total_tx = 0, 0
-    for net in networks.values():
-        total_rx += net["rx_bytes"]
-        total_tx += net["tx_bytes"]
-    return total_rx, total_tx
-
-def get_memory_usage(container_stats):
-    memory_usage = container_stats['memory_stats']['usage'] if "usage" in container_stats['memory_stats'] else 0
-    max_memory = container_stats['memory_stats']['limit'] if "limit" in container_stats['memory_stats'] else 0
-    memory_percent = (memory_usage / max_memory) * 100
-    return memory_usage, memory_percent
+        ingest_spool.append_many(events)
+    except SpoolLocked as ex:
+        # events from this process are not durable until it gets a spool directory of its own
+        print("ERROR: ingest spool not usable by process {}, writing WITHOUT the spool:".format(os.getpid()), ex)
+        return False
+    except SpoolUnavailable as ex:
+        print("Ingest spool unavailable, using the bulk ingester", ex)
+        return False
+    return True
+
+
+# Function to hand a document to the spool or the bulk ingester, shared by the WSGI and ASGI SystemData views.
+# Answers 202 once the document is buffered, with `wait` 200 once it is written or 500 when it was rejected.
+def ingest_document(index, document, wait=False, timeout=30):
+    if not wait and spool_events([(index, document)]):
+        return JsonResponse({"message": "Data accepted"}, safe=False, status=202)
+
+    ticket = bulk_ingester.submit(index, document, flush=wait)
+    if not wait:
+        return JsonResponse({"message": "Data accepted"}, safe=False, status=202)
+
+    if not ticket.wait(timeout):
+        print("Unable to add the data", ticket.error)
+        return JsonResponse({"message": "something went wrong"}, safe=False, status=500)
+    return JsonResponse({"message": "Successfully Added the data"}, safe=False, status=200)
+
+# Distinct hostnames kept in memory for the autocomplete endpoint
+hostname_index = HostnameIndex(
+    index_name,
+    settings.HOSTNAME_KEYWORD_FIELD,
+    resolver=index_resolver,
+    refresh_interval=settings.HOSTNAME_INDEX_REFRESH_INTERVAL,
+    full_refresh_interval=settings.HOSTNAME_INDEX_FULL_REFRESH_INTERVAL,
+)
+
+# Workers collecting the docker stats of the containers in parallel
+docker_stats_pool = ThreadPoolExecutor(max_workers=settings.DOCKER_STATS_WORKERS, thread_name_prefix="docker-stats")
+
+# Containers kept current from the docker events stream, its client is shared by every docker call
+docker_inventory = DockerInventory(timeout=settings.DOCKER_STATS_TIMEOUT)
+
+# Latest stats of every container, SystemProcessData answers from it once the first listing is done
+container_sampler = ContainerSampler(docker_inventory, refresh_interval=settings.CONTAINER_SAMPLER_REFRESH_INTERVAL)
+
+# Container restarts requested through SystemProcessData.post
+restart_jobs = RestartJobs(
+    docker_inventory,
+    concurrency=settings.CONTAINER_RESTART_CONCURRENCY,
+    restart_timeout=settings.CONTAINER_RESTART_TIMEOUT,
+)
+
+# Latest host metrics, SystemData answers from it
+host_sampler = HostSampler(
+    DiskProber(
+        timeout=settings.DISK_PROBE_TIMEOUT,
+        ttl=settings.DISK_PROBE_TTL,
+        exclude_fstypes=settings.DISK_EXCLUDE_FSTYPES,
+        exclude_paths=settings.DISK_EXCLUDE_PATHS,
+    ),
+    interval=settings.HOST_SAMPLER_INTERVAL,
+)
+
+# Downsampled history of the host and container metrics for the charts
+metrics_history = MetricsHistory(
+    container_sampler,
+    host_sampler,
+    settings.METRICS_HISTORY_TIERS,
+    interval=settings.METRICS_HISTORY_INTERVAL,
+)
+
+# Pushes the recorded metrics to the clients of the metrics stream
+metrics_broadcaster = MetricsBroadcaster(metrics_history, interval=settings.METRICS_STREAM_INTERVAL)
+
+# Pcap analyses queued by ExecutePcapFile, run by the server processes started with PCAP_RUN_JOBS
+pcap_jobs = PcapJobQueue(
+    settings.PCAP_OUTPUT_DIR,
+    workers=settings.PCAP_WORKERS,
+    timeouts={"zeek": settings.PCAP_ZEEK_TIMEOUT, "suricata": settings.PCAP_SURICATA_TIMEOUT},
+    run_jobs=settings.PCAP_RUN_JOBS,
+)
+
+# Host and container gauges on /metrics, read from the sampler snapshots
+registry.add_collector(lambda: host_families(host_sampler.snapshot))
+registry.add_collector(lambda: container_families(container_sampler.snapshot()))
+
+
+# Function to collect the details and stats of every container in parallel, used until the sampler is ready
+def collect_containers_info():
+    if not docker_inventory.wait_ready(settings.DOCKER_STATS_TIMEOUT):
+        raise TimeoutError("docker containers not listed in time")
+    # the inventory client timeout bounds each container's stats call, collect_container_stats its retry
+    entries = docker_inventory.items()
+    futures = [
+        docker_stats_pool.submit(collect_container_stats, container, settings.DOCKER_STATS_TIMEOUT)
+        for container, _ in entries
+    ]
+    wait(futures, timeout=settings.DOCKER_STATS_TIMEOUT + 1)
+
+    # containers that do not answer in time are returned without their metrics, a call still running is left
+    # to finish on its own, its worker is freed by the client timeout
+    containers_info = []
+    for (container, info), future in zip(entries, futures):
+        info = dict(info)
+        stats = None
+        if not future.done():
+            print("Unable to get the stats of container", container.name, "timed out")
+        elif future.exception() is not None:
+            ex = future.exception()
+            print("Unable to get the stats of container", container.name, type(ex).__name__, ex)
+        else:
+            stats = future.result()
+        info.update(stats or {key: None for key in container_stats_fields})
+        info["partial"] = stats is None
+        containers_info.append(info)
+    return containers_info
+
+
+# Function to turn an epoch bound into milliseconds the way `index_resolver` reads it, elasticsearch would take
+# epoch seconds for milliseconds. Dates and date math are left for elasticsearch to parse.
+def epoch_bound(value):
+    if value is not None and str(value).strip().isdigit():
+        return parse_time(value)
+    return value
+
+
+# Function to build the filebeat query from the hostname search and an optional @timestamp range
+def build_data_query(search="", time_from=None, time_to=None):
+    time_from, time_to = epoch_bound(time_from), epoch_bound(time_to)
+    epoch = isinstance(time_from, int) or isinstance(time_to, int)
+    return build_query([
+        prefix_filter("hostname", search),
+        range_filter("@timestamp", gte=time_from, lte=time_to,
+                     format="strict_date_optional_time||epoch_millis" if epoch else None),
+    ])
+
+
+# Fields of the filebeat documents returned by ElasticData
+data_fields = ["host"]
+
+
+# Function to build the index and search body of ElasticData from its request parameters
+def build_data_search(params):
+    size = int(params.get("size", 10))
+    if size <= 0:
+        raise ValueError("size must be greater than 0")
+    page = int(params.get("page", 0))
+    time_from = params.get("from")
+    time_to = params.get("to")
+    search_query = build_search(
+        build_data_query(params.get("search", ""), time_from, time_to),
+        size=size,
+        page=page,
+        source=data_fields,
+    )
+    return index_resolver.resolve(time_from, time_to), search_query
+
+
+def format_data_hit(_res):
+    return {
+        "id": _res['_id'],
+        "host": _res['_source']['host']
+    }
 
 
 # Create your views here.
@@ -83,9 +250,19 @@ class ElasticData(APIView):
         and a `limit` parameter for the number of results to return. It builds an Elasticsearch query
         based on whether the `search` parameter is provided. If `search` is not empty, it adds a
         `match_phrase_prefix` filter to narrow the results to those where the 'hostname' field starts
-        with the search term. The method then constructs an Elasticsearch query using the boolean `must`
-        condition when there are search terms and handles pagination with `skip` and `limit`. The results
-        are filtered to only include the ID and host fields from the source.
+        with the search term. The constraint runs in the non-scoring `filter` context of a boolean
+        query (see `elastic_search_api_new.query_builder`) and pagination uses `page` and `size`. The
+        results are filtered to only include the ID and host fields from the source.
+
+        Passing a `cursor` parameter switches the view to cursor pagination. An empty `cursor` opens
+        a point-in-time on the index and returns the first page, every response then carries a
+        `next_cursor` that is sent back as `cursor` to read the following page with `search_after`.
+        Deep pages cost the same as the first one and are not limited by the 10k result window.
+        `next_cursor` is null once the last page has been returned.
+
+        Optional `from` and `to` parameters limit the results to a range on `@timestamp`. They accept
+        epoch seconds or milliseconds, ISO 8601 dates and `now`/`now-15m` style date math, and the
+        search only touches the backing indices whose documents fall into the range.
 
         If the Elasticsearch query returns results, the method packages these into a JSON response
         along with a success message. If no results are found, it returns a JSON response with an
@@ -100,59 +277,143 @@ class ElasticData(APIView):
     """
     def get(self, request):
         try:
-            size = int(request.GET.get("size", 10))
-            page = int(request.GET.get("page", 0))
-            search = request.GET.get("search", "")
-            must_query = []
-            if search != "":
-                must_query.append({"match_phrase_prefix": {"hostname": search}})
-
-            if len(must_query) == 0:
-                search_query = {
-                    "query": {
-                        "match_all": {}
-                    },
-                    "size": size,
-                    "from": page * 10,
-                }
-            else:
-                search_query = {
-                    "query": {
-                        "bool": {
-                            "must": must_query,
-                            "minimum_should_match": 1,
-                            "boost": 1.0,
-                        }
-                    },
-                    "size": size,
-                    "from": page * 10,
-                }
+            if int(request.GET.get("size", 10)) <= 0:
+                return JsonResponse({"message": "size must be greater than 0"}, safe=False, status=400)
+            search_index, search_query = build_data_search(request.GET)
+            if search_index == "" and not request.GET.get("cursor"):
+                response = {"data": [], "message": "No Data Found"}
+                if "cursor" in request.GET:
+                    response["next_cursor"] = None
+                return JsonResponse(response, safe=False, status=404)
+
+            if "cursor" in request.GET:
+                hits, next_cursor = search_page(
+                    search_index,
+                    search_query["query"],
+                    search_query["size"],
+                    cursor=request.GET.get("cursor"),
+                    source=search_query["_source"],
+                    filter_path=hits_filter_path(data_fields),
+                )
+                response_data = [format_data_hit(_res) for _res in hits]
+                message = "Data Found" if len(response_data) else "No Data Found"
+                response = {"data": response_data, "next_cursor": next_cursor, "message": message}
+                return JsonResponse(response, safe=False, status=200)
 
-            res_filter_parameters = es_url.search(
-                index=index_name,
+            res_filter_parameters = cached_search(
+                index=search_index,
+                cache_index=index_name,
                 body=search_query,
-                filter_path=[
-                    "hits.hits._id",
-                    "hits.hits._source.host",
-                ],
+                filter_path=hits_filter_path(data_fields),
             )
             print(search_query)
             if len(res_filter_parameters) == 0:
                 response = {"data": [], "message": "No Data Found"}
                 return JsonResponse(response, safe=False, status=404)
             else:
-                response_data = []
-                for _res in res_filter_parameters['hits']['hits']:
-                    response_data.append(
-                        {
-                            "id": _res['_id'],
-                            "host": _res['_source']['host']
-                        }
-                    )
+                response_data = [format_data_hit(_res) for _res in res_filter_parameters['hits']['hits']]
                 response = {"data": response_data, "message": "Data Found"}
                 return JsonResponse(response, safe=False, status=200)
 
+        except InvalidCursor as ex:
+            return JsonResponse({"message": str(ex)}, safe=False, status=400)
+        except Exception as ex:
+            print("Error on line {}".format(sys.exc_info()[-1].tb_lineno), type(ex).__name__, ex)
+            error = {
+                "message": "something went wrong"
+            }
+            return JsonResponse(error, safe=False, status=500)
+
 
+class BatchSearch(APIView):
+    permission_classes = (IsAuthenticated,)
+    """
+        API view answering several list queries with a single `_msearch` round trip.
+
+        The body is `{"queries": [{"name": ..., "type": ..., "params": {...}}]}` where `type` is one of
+        `data`, `roles` or `users` and `params` are the query parameters the matching list view takes
+        (`search`, `page`, `size`, plus `from`/`to` for `data`). Results are keyed by `name` and
+        shaped like the list views, entries that fail carry their own `error` and `status` instead of
+        failing the whole batch. A query reusing the name of an earlier one is not run, its error is
+        keyed `<name>#<position>` so the result of the earlier query is kept.
+    """
+    sources = {
+        "data": (build_data_search, format_data_hit, data_fields),
+        "roles": (build_role_search, format_role_hit, role_fields),
+        "users": (build_user_search, format_user_hit, user_fields),
+    }
+    max_queries = 50
+
+    def post(self, request):
+        try:
+            queries = request.data.get("queries")
+            if not queries:
+                return JsonResponse({'error': 'queries is required in the JSON body.'}, status=400)
+            if not isinstance(queries, list):
+                return JsonResponse({'error': 'queries must be an array.'}, status=400)
+            if len(queries) > self.max_queries:
+                return JsonResponse({'error': f'at most {self.max_queries} queries are allowed.'}, status=400)
+
+            results = {}
+            searches = []
+            pending = []
+            names = set()
+            for position, query in enumerate(queries):
+                if not isinstance(query, dict):
+                    name = str(position) if str(position) not in names else "{0}#{0}".format(position)
+                    names.add(name)
+                    results[name] = {"error": "query must be an object", "status": 400}
+                    continue
+                name = str(query.get("name", position))
+                if name in names:
+                    name = "{}#{}".format(name, position)
+                    names.add(name)
+                    results[name] = {"error": "duplicate query name", "status": 400}
+                    continue
+                names.add(name)
+                source = self.sources.get(query.get("type"))
+                if source is None:
+                    results[name] = {"error": "type must be one of " + ", ".join(self.sources), "status": 400}
+                    continue
+                params = query.get("params") or {}
+                try:
+                    search_index, search_query = source[0](params)
+                except (TypeError, ValueError, AttributeError) as ex:
+                    results[name] = {"error": "invalid params: " + str(ex), "status": 400}
+                    continue
+                if search_index == "":
+                    results[name] = {"data": [], "message": "No Data Found"}
+                    continue
+                searches.append({"index": search_index})
+                searches.append(search_query)
+                pending.append((name, source[1]))
+
+            if len(pending):
+                res = es_url.msearch(
+                    body=searches,
+                    filter_path=[
+                        "responses.status",
+                        "responses.error.type",
+                        "responses.error.reason",
+                        "responses.hits.hits._id",
+                        "responses.hits.hits._source",
+                    ],
+                )
+                for (name, format_hit), _res in zip(pending, res["responses"]):
+                    if "error" in _res:
+                        results[name] = {"error": _res["error"].get("reason", _res["error"].get("type")),
+                                         "status": _res.get("status", 500)}
+                        continue
+                    try:
+                        response_data = [format_hit(_hit) for _hit in _res.get("hits", {}).get("hits", [])]
+                    except KeyError as ex:
+                        results[name] = {"error": "document is missing field " + str(ex), "status": 500}
+                        continue
+                    message = "Data Found" if len(response_data) else "No Data Found"
+                    results[name] = {"data": response_data, "message": message}
+
+            response = {"data": results, "message": "Data Found"}
+            return JsonResponse(response, safe=False, status=200)
 
         except Exception as ex:
             print("Error on line {}".format(sys.exc_info()[-1].tb_lineno), type(ex).__name__, ex)
@@ -162,69 +423,349 @@ class ElasticData(APIView):
             return JsonResponse(error, safe=False, status=500)
 
 
-class SystemProcessData(APIView):
+class AggregateData(APIView):
+    permission_classes = (IsAuthenticated,)
+    """
+        API view computing event counts inside Elasticsearch instead of returning raw hits.
+
+        Accepts the same `search`, `from` and `to` filters as `ElasticData` and a `type` of:
+
+            hosts       top `size` hostnames by event count (terms aggregation)
+            histogram   event count per `interval` bucket of `@timestamp` (date_histogram, default 1m)
+            composite   every hostname with its count, `size` at a time, continue with `after`
+
+        The search runs with `size: 0`, so only the buckets cross the wire. Buckets are returned as
+        parallel `keys`/`counts` arrays, histogram keys are epoch milliseconds.
+    """
+    aggregation_types = ("hosts", "histogram", "composite")
+    max_size = 10000
+    # fixed_interval units accepted by Elasticsearch, e.g. 30s, 5m, 1h
+    interval_pattern = re.compile(r"[1-9][0-9]*(ms|s|m|h|d)")
+
+    def get(self, request):
+        try:
+            aggregation_type = request.GET.get("type", "hosts")
+            if aggregation_type not in self.aggregation_types:
+                error = {"message": "type must be one of " + ", ".join(self.aggregation_types)}
+                return JsonResponse(error, safe=False, status=400)
+            search = request.GET.get("search", "")
+            time_from = request.GET.get("from")
+            time_to = request.GET.get("to")
+            size = request.GET.get("size", "10")
+            if not size.isdigit() or int(size) <= 0:
+                return JsonResponse({"message": "size must be a positive integer"}, safe=False, status=400)
+            size = min(int(size), self.max_size)
+            interval = request.GET.get("interval", "1m")
+            if not self.interval_pattern.fullmatch(interval):
+                error = {"message": "interval must be a positive number followed by one of ms, s, m, h, d"}
+                return JsonResponse(error, safe=False, status=400)
+            after = request.GET.get("after") or None
+
+            search_index = index_resolver.resolve(time_from, time_to)
+            response = {"keys": [], "counts": []}
+            if aggregation_type == "composite":
+                response["next_after"] = None
+            if search_index == "":
+                response["message"] = "No Data Found"
+                return JsonResponse(response, safe=False, status=200)
+
+            if aggregation_type == "hosts":
+                aggregation = terms_agg(settings.HOSTNAME_KEYWORD_FIELD, size)
+            elif aggregation_type == "histogram":
+                aggregation = date_histogram_agg("@timestamp", interval)
+            else:
+                aggregation = composite_agg("hostname", settings.HOSTNAME_KEYWORD_FIELD, size, after)
+
+            res_filter_parameters = cached_search(
+                index=search_index,
+                cache_index=index_name,
+                body=build_aggregation(build_data_query(search, time_from, time_to), {"data": aggregation}),
+                filter_path=[
+                    "aggregations.data.buckets.key",
+                    "aggregations.data.buckets.doc_count",
+                    "aggregations.data.after_key",
+                ],
+            )
+            result = res_filter_parameters.get("aggregations", {}).get("data", {})
+            for bucket in result.get("buckets", []):
+                key = bucket["key"]
+                response["keys"].append(key["hostname"] if aggregation_type == "composite" else key)
+                response["counts"].append(bucket["doc_count"])
+            if aggregation_type == "composite" and len(response["keys"]) == size:
+                response["next_after"] = result.get("after_key", {}).get("hostname")
+
+            response["message"] = "Data Found" if len(response["keys"]) else "No Data Found"
+            return JsonResponse(response, safe=False, status=200)
+
+        except Exception as ex:
+            print("Error on line {}".format(sys.exc_info()[-1].tb_lineno), type(ex).__name__, ex)
+            error = {
+                "message": "something went wrong"
+            }
+            return JsonResponse(error, safe=False, status=500)
+
+
+class HostnameAutocomplete(APIView):
+    permission_classes = (IsAuthenticated,)
+    """
+        API view returning up to `limit` hostnames starting with `search` (case insensitive).
+
+        Completions come from the in-process `hostname_index` and never query Elasticsearch, the
+        index is seeded and kept current in the background. `ready` is false until the first seed
+        has finished.
+    """
+    max_limit = 100
+
+    def get(self, request):
+        try:
+            search = request.GET.get("search", "")
+            limit = min(int(request.GET.get("limit", 10)), self.max_limit)
+            completions = hostname_index.complete(search, limit)
+            message = "Data Found" if len(completions) else "No Data Found"
+            response = {"data": completions, "ready": hostname_index.ready(), "message": message}
+            return JsonResponse(response, safe=False, status=200)
+
+        except Exception as ex:
+            print("Error on line {}".format(sys.exc_info()[-1].tb_lineno), type(ex).__name__, ex)
+            error = {
+                "message": "something went wrong"
+            }
+            return JsonResponse(error, safe=False, status=500)
+
+
+class IngestNdjson(APIView):
+    permission_classes = (IsAuthenticated,)
+    """
+        API view for high volume event submission as newline delimited JSON.
+
+        The body is read line by line and never loaded as a whole. Chunked bodies without a content
+        length are only accepted by the ASGI application, the WSGI server can not hand them over and
+        answers 411. Each line must be a JSON object, it gets `@timestamp` stamped like in
+        `SystemData.post` and goes straight into `bulk_ingester`, so a large backfill turns into a
+        few large bulk requests with bounded memory. Blank lines are skipped, lines that are not
+        JSON objects are counted and reported with their line number (the first `max_errors`).
+        When `ingest_spool` is configured, documents are spooled `spool_batch` lines at a time instead.
+
+        By default the view answers 202 once every line has been buffered. With `?wait=true` it
+        waits for the last bulk flush and reports how many documents were accepted and failed.
+    """
+    max_line_bytes = 1024 * 1024
+    max_errors = 100
+    flush_timeout = 300
+    spool_batch = 500
+
+    def post(self, request):
+        try:
+            wait = request.GET.get("wait", "").lower() in ("1", "true")
+            stream = self.open_body(request)
+            if stream is None:
+                error = {"message": "chunked bodies need the ASGI application, send a Content-Length"}
+                return JsonResponse(error, safe=False, status=411)
+            ticket = IngestBatchTicket()
+            use_spool = not wait and ingest_spool is not None
+            spooled = []
+            lines = 0
+            queued = 0
+            invalid = 0
+            errors = []
+            while True:
+                line = stream.readline(self.max_line_bytes)
+                if not line:
+                    break
+                lines += 1
+                if len(line) >= self.max_line_bytes and not line.endswith(b"\n"):
+                    # skip the rest of the oversized line
+                    while line and not line.endswith(b"\n"):
+                        line = stream.readline(self.max_line_bytes)
+                    error = "line is longer than {} bytes".format(self.max_line_bytes)
+                else:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        doc = json.loads(line)
+                        error = None if isinstance(doc, dict) else "line is not a JSON object"
+                    except ValueError as ex:
+                        error = "invalid JSON: " + str(ex)
+                if error:
+                    invalid += 1
+                    if len(errors) < self.max_errors:
+                        errors.append({"line": lines, "error": error})
+                    continue
+                doc['@timestamp'] = int(datetime.now().timestamp())
+                queued += 1
+                if use_spool:
+                    spooled.append((write_index_name, doc))
+                    if len(spooled) >= self.spool_batch:
+                        use_spool = spool_events(spooled)
+                        if not use_spool:
+                            for index, spooled_doc in spooled:
+                                bulk_ingester.submit(index, spooled_doc, ticket=ticket)
+                        spooled = []
+                    continue
+                bulk_ingester.submit(write_index_name, doc, ticket=ticket)
+            if spooled and not spool_events(spooled):
+                for index, spooled_doc in spooled:
+                    bulk_ingester.submit(index, spooled_doc, ticket=ticket)
+            ticket.close()
+
+            response = {"lines": lines, "queued": queued, "invalid": invalid, "errors": errors}
+            if not wait:
+                response["message"] = "Data accepted"
+                return JsonResponse(response, safe=False, status=202)
+
+            bulk_ingester.flush()
+            if not ticket.wait(self.flush_timeout):
+                response["message"] = "Timed out waiting for the bulk flush"
+                return JsonResponse(response, safe=False, status=504)
+            response["accepted"] = ticket.accepted
+            response["failed"] = ticket.failed
+            response["message"] = "Successfully Added the data"
+            return JsonResponse(response, safe=False, status=200)
+
+        except Exception as ex:
+            print("Error on line {}".format(sys.exc_info()[-1].tb_lineno), type(ex).__name__, ex)
+            error = {
+                "message": "something went wrong"
+            }
+            return JsonResponse(error, safe=False, status=500)
+
+    @staticmethod
+    def open_body(request):
+        """
+            Returns the body as a stream, or None for a chunked body under the WSGI server.
+        """
+        meta = request.META
+        if not meta.get("CONTENT_LENGTH") and "chunked" in meta.get("HTTP_TRANSFER_ENCODING", "").lower():
+            # runserver hands out an empty stream for a body without a content length, the ASGI
+            # handler has the whole body spooled before the view runs
+            if "wsgi.input" in meta:
+                return None
+            # DRF has no stream without a content length, the read methods of the django request
+            # are proxied by the DRF request
+            return request
+        return request.stream or io.BytesIO()
+
+
+class IngestStats(APIView):
+    permission_classes = (IsAuthenticated,)
+    def get(self, request):
+        stats = bulk_ingester.stats()
+        stats["spool"] = ingest_spool.stats() if ingest_spool is not None else None
+        response = {"data": stats, "message": "Data Found"}
+        return JsonResponse(response, safe=False, status=200)
+
+
+class SearchCacheStats(APIView):
     permission_classes = (IsAuthenticated,)
     def get(self, request):
+        stats = search_cache.stats()
+        stats["coalescing"] = {
+            "sync": search_flight.stats(),
+            "async": async_search_flight.stats(),
+        }
+        response = {"data": stats, "message": "Data Found"}
+        return JsonResponse(response, safe=False, status=200)
+
+    def delete(self, request):
+        search_cache.invalidate()
+        return JsonResponse({"message": "Cache cleared"}, safe=False, status=200)
+
+
+class ExportData(APIView):
+    permission_classes = (IsAuthenticated,)
+    """
+        API view for exporting filebeat hits as newline delimited JSON.
+
+        Accepts the same `search` hostname filter as `ElasticData`, an optional `from`/`to` range on
+        `@timestamp`, a comma separated `fields` list to limit the exported `_source` and a
+        `batch_size` for the number of hits fetched per round trip. The index is walked with a
+        point-in-time and `search_after`, and every batch is written to the client as soon as it
+        arrives, so memory stays flat no matter how many documents are exported. When paging fails
+        half way, the export ends with an `{"error": ...}` line and the response is aborted.
+    """
+    max_batch_size = 10000
+
+    def get(self, request):
+        try:
+            search = request.GET.get("search", "")
+            time_from = request.GET.get("from")
+            time_to = request.GET.get("to")
+            fields = [field.strip() for field in request.GET.get("fields", "").split(",") if field.strip()]
+            batch_size = min(int(request.GET.get("batch_size", 1000)), self.max_batch_size)
+            if batch_size <= 0:
+                return JsonResponse({"message": "batch_size must be greater than 0"}, safe=False, status=400)
+
+            query = build_data_query(search, time_from, time_to)
+            search_index = index_resolver.resolve(time_from, time_to)
+            if search_index == "":
+                return StreamingHttpResponse(iter([]), content_type="application/x-ndjson")
+            pages = iter_pages(
+                search_index,
+                query,
+                batch_size,
+                source=fields if len(fields) else None,
+                filter_path=hits_filter_path() + ["hits.hits._index"],
+            )
+            # read the first batch up front so a failing cluster still answers with a proper 500
+            first_hits = next(pages, [])
+            response = StreamingHttpResponse(self.stream_hits(first_hits, pages), content_type="application/x-ndjson")
+            response["Content-Disposition"] = 'attachment; filename="filebeat-export.ndjson"'
+            return response
+
+        except Exception as ex:
+            print("Error on line {}".format(sys.exc_info()[-1].tb_lineno), type(ex).__name__, ex)
+            error = {
+                "message": "something went wrong"
+            }
+            return JsonResponse(error, safe=False, status=500)
+
+    @staticmethod
+    def stream_hits(first_hits, pages):
         try:
-            ## get the docker details
-            client = docker.from_env()
-            containers_info = []
+            for hits in itertools.chain([first_hits], pages):
+                if not hits:
+                    continue
+                lines = []
+                for _res in hits:
+                    lines.append(json.dumps({
+                        "_id": _res["_id"],
+                        "_index": _res["_index"],
+                        "_source": _res.get("_source", {}),
+                    }))
+                yield "\n".join(lines) + "\n"
+        except Exception as ex:
+            # headers are already sent at this point: end with an error line the client can tell apart from
+            # a document, then abort the response so it is not mistaken for a complete export
+            print("Error while streaming export", type(ex).__name__, ex)
+            yield json.dumps({"error": "export interrupted: {}".format(type(ex).__name__)}) + "\n"
+            raise
+        finally:
+            pages.close()
+
 
+class SystemProcessData(APIView):
+    permission_classes = (IsAuthenticated,)
+    def get(self, request):
+        try:
             # System uptime
             uptime_seconds = datetime.now().timestamp() - psutil.boot_time()
             uptime = str(timedelta(seconds=int(uptime_seconds)))
 
-            # Get details for each container
-            containers_info = []
-            for container in client.containers.list(all=True):
-                stats = container.stats(stream=False)
-
-                # Some stats may not be immediately available for new containers
-                if 'precpu_stats' not in stats or not stats['precpu_stats']:
-                    time.sleep(1)  # Wait a second before retrying
-                    stats = container.stats(stream=False)
-
-                try:
-                    cpu_percent = calculate_cpu_percent(stats)
-                except Exception as ex:
-                    print("Error on line {}".format(sys.exc_info()[-1].tb_lineno), type(ex).__name__, ex)
-                    cpu_percent = 0
-                memory_usage = stats["memory_stats"]["usage"] if "usage" in stats['memory_stats'] else 0
-                memory_limit = stats["memory_stats"]["limit"] if "limit" in stats['memory_stats'] else 0
-                net_rx, net_tx = get_network_io(stats)
-                try:
-                    block_read, block_write = stats["blkio_stats"]["io_service_bytes_recursive"][0]["value"], \
-                                              stats["blkio_stats"]["io_service_bytes_recursive"][1]["value"]
-                except:
-                    block_read, block_write = 0, 0
-                pids = stats["pids_stats"]["current"] if "current" in stats["pids_stats"] else 0
-                name = container.name
-                id = container.id
-                # Get container status
-                status = container.status
-
-                # Get IP address
-                ip_address = container.attrs['NetworkSettings']['IPAddress']
-                if not ip_address:  # IPAddress might be an empty string if the container is not using the default bridge network
-                    # If the container is connected to a user-defined network, fetch the IP from the Networks section
-                    networks = container.attrs['NetworkSettings']['Networks']
-                    if networks:
-                        # Get the IP address from the first available network
-                        ip_address = list(networks.values())[0]['IPAddress']
-
-                containers_info.append({
-                    'name': f"{name}",
-                    'title': f"{name}",
-                    'status': f"{status}",
-                    "id": f"{id}",
-                    'cpu_percent': f"{cpu_percent}",
-                    'memory_usage': f"{memory_usage / (1024 ** 3):.2f}GiB",
-                    'memory_limit': f"{memory_limit / (1024 ** 3):.2f}GiB",
-                    'net_io': f"{net_rx / (1024 ** 2):.2f}MB / {net_tx / (1024 ** 2):.2f}MB",
-                    'block_io': f"{block_read / (1024 ** 2):.2f}MB / {block_write / (1024 ** 2):.2f}MB",
-                    'pids': pids,
-                    "ip_address": ip_address
-                })
+            ## get the docker details from the sampler, the first requests collect them directly
+            metrics_history.start()
+            if container_sampler.ready():
+                containers_info = []
+                for info, values in container_sampler.snapshot():
+                    info = dict(info)
+                    if values is None:
+                        info.update({key: None for key in container_stats_fields})
+                    else:
+                        info.update(format_container_stats(values))
+                    info["partial"] = values is None
+                    containers_info.append(info)
+            else:
+                containers_info = collect_containers_info()
 
             response = {"data": containers_info, "message": "Data Found", "system_up_time": uptime}
             return JsonResponse(response, safe=False, status=200)
@@ -249,24 +790,102 @@ class SystemProcessData(APIView):
                 }
                 return JsonResponse(error, safe=False, status=400)
 
-            ## get the docker details
-            client = docker.from_env()
-            containers_info = data['container_ids']
-            for _ids in containers_info:
-                try:
-                    # Find the container by name
-                    container = client.containers.get(_ids)
-                    print(f"Restarting container: {container.name}")
-                    container.restart()  # Restart the container
-                    print(f"Container {container.name} has been restarted successfully.")
-                except docker.errors.NotFound:
-                    print(f"No container with the id '{_ids}' was found.")
-                except docker.errors.APIError as e:
-                    print(f"An error occurred while trying to restart the container '{_ids}': {e}")
+            container_ids = data.get('container_ids')
+            if not isinstance(container_ids, list) or len(container_ids) == 0:
+                error = {
+                    "message": "container_ids must be a non empty array"
+                }
+                return JsonResponse(error, safe=False, status=400)
 
+            ## restart the containers in the background, the job status is read from RestartJobStatus
+            job = restart_jobs.submit(container_ids)
             response = {
-                "message": "Successfully restarted"
+                "job_id": job["id"],
+                "data": job,
+                "message": "Restart started"
+            }
+            return JsonResponse(response, safe=False, status=202)
+
+        except Exception as ex:
+            print("Error on line {}".format(sys.exc_info()[-1].tb_lineno), type(ex).__name__, ex)
+            error = {
+                "message": "something went wrong"
+            }
+            return JsonResponse(error, safe=False, status=500)
+
+
+class RestartJobStatus(APIView):
+    permission_classes = (IsAuthenticated,)
+    """
+        Status of a restart job started by `SystemProcessData.post`: the job is pending, restarting,
+        done or failed, and every container carries its own status, duration and error.
+    """
+
+    def get(self, request, job_id):
+        try:
+            job = restart_jobs.get(job_id)
+            if job is None:
+                response = {"data": {}, "message": "No Data Found"}
+                return JsonResponse(response, safe=False, status=404)
+            response = {"data": job, "message": "Data Found"}
+            return JsonResponse(response, safe=False, status=200)
+
+        except Exception as ex:
+            print("Error on line {}".format(sys.exc_info()[-1].tb_lineno), type(ex).__name__, ex)
+            error = {
+                "message": "something went wrong"
+            }
+            return JsonResponse(error, safe=False, status=500)
+
+
+class MetricsStreamToken(APIView):
+    permission_classes = (IsAuthenticated,)
+    """
+        Short-lived token to open `async/system/metrics/stream` from a browser EventSource, which
+        can not send the Authorization header: pass it as the `token` query parameter.
+    """
+
+    def get(self, request):
+        try:
+            data = {"token": sign_query_token(request.user), "expires_in": settings.METRICS_STREAM_TOKEN_MAX_AGE}
+            response = {"data": data, "message": "Data Found"}
+            return JsonResponse(response, safe=False, status=200)
+
+        except Exception as ex:
+            print("Error on line {}".format(sys.exc_info()[-1].tb_lineno), type(ex).__name__, ex)
+            error = {
+                "message": "something went wrong"
             }
+            return JsonResponse(error, safe=False, status=500)
+
+
+class MetricsHistoryRange(APIView):
+    permission_classes = (IsAuthenticated,)
+    """
+        Metrics history of the host (`target=host`, the default) or of a container (`target=<id or
+        name>`) between `from` and `to` (default the last 10 minutes), as one array per metric next
+        to the bucket timestamps in epoch seconds. The resolution is the finest tier still holding
+        `from`, it is returned as `step`.
+    """
+
+    def get(self, request):
+        try:
+            target = request.GET.get("target", "host")
+            time_from = parse_time(request.GET.get("from", "now-10m"))
+            time_to = parse_time(request.GET.get("to", "now"))
+            if time_from is None or time_to is None:
+                return JsonResponse({"message": "from and to must be dates"}, safe=False, status=400)
+
+            result = metrics_history.range(target, time_from / 1000, time_to / 1000)
+            if result is None:
+                response = {"data": {}, "message": "No Data Found"}
+                return JsonResponse(response, safe=False, status=404)
+
+            step, timestamps, columns = result
+            data = {"target": target, "step": step, "timestamps": timestamps}
+            data.update(columns)
+            message = "Data Found" if len(timestamps) else "No Data Found"
+            response = {"data": data, "message": message}
             return JsonResponse(response, safe=False, status=200)
 
         except Exception as ex:
@@ -277,15 +896,49 @@ class SystemProcessData(APIView):
             return JsonResponse(error, safe=False, status=500)
 
 
+class MetricsExposition(APIView):
+    permission_classes = (IsAuthenticated,)
+    """
+        Host, container, API and Elasticsearch metrics in the OpenMetrics text format, for
+        Prometheus to scrape with `authorization: {type: Token, credentials: <token>}`. Everything
+        is read from memory, the samplers are only started here.
+    """
+
+    def get(self, request):
+        try:
+            metrics_history.start()
+            return HttpResponse(
+                registry.render(),
+                content_type="application/openmetrics-text; version=1.0.0; charset=utf-8",
+            )
+
+        except Exception as ex:
+            print("Error on line {}".format(sys.exc_info()[-1].tb_lineno), type(ex).__name__, ex)
+            error = {
+                "message": "something went wrong"
+            }
+            return JsonResponse(error, safe=False, status=500)
+
+
 class SystemData(APIView):
     permission_classes = (IsAuthenticated,)
+    """
+        `post` stamps `@timestamp` on the posted document and hands it to `bulk_ingester`, which
+        writes buffered documents with the bulk api. The view answers 202 as soon as the document is
+        buffered, or once it is fsync'd to `ingest_spool` when the spool is configured. With
+        `?wait=true` it flushes right away and answers 200 once the document is written, or 500 when
+        Elasticsearch rejected it.
+
+        `get` answers from the snapshot of `host_sampler` and never waits for psutil, except on
+        the first request after a start, which waits up to `sample_timeout` for the first sample.
+    """
+    flush_timeout = 30
+    sample_timeout = 5
+
     def post(self, request):
         try:
             data = request.data
-            current = datetime.now()
-            str_date = datetime.strftime(current, "%Y.%m.%d")
-            # data_add_index = ".ds-filebeat-8.13.2-"+str_date+"-000001"
-            data_add_index = "filebeat-8.13.2"
+            data_add_index = write_index_name
             timestamp = int(datetime.now().timestamp())
             if len(data) == 0:
                 error = {
@@ -293,13 +946,8 @@ class SystemData(APIView):
                 }
                 return JsonResponse(error, safe=False, status=400)
             data['@timestamp'] = timestamp
-            res = es_url.index(index=data_add_index, body=data, op_type="create")
-            print(res['result'])
-
-            response = {
-                "message": "Successfully Added the data"
-            }
-            return JsonResponse(response, safe=False, status=200)
+            wait = request.GET.get("wait", "").lower() in ("1", "true")
+            return ingest_document(data_add_index, dict(data), wait, self.flush_timeout)
 
         except Exception as ex:
             print("Error on line {}".format(sys.exc_info()[-1].tb_lineno), type(ex).__name__, ex)
@@ -311,23 +959,26 @@ class SystemData(APIView):
 
     def get(self, request):
         try:
+            metrics_history.start()
+            ## the host metrics come from the background sampler, only the first request waits for it
+            if not host_sampler.wait_ready(self.sample_timeout):
+                error = {
+                    "message": "something went wrong"
+                }
+                return JsonResponse(error, safe=False, status=500)
+            snapshot = host_sampler.snapshot
             chart_data = []
-            interfaces_info = []
             # CPU information
-            cpu_usage = psutil.cpu_percent(interval=1)  # Measures over one second
-            print(f"CPU Usage: {cpu_usage}%")
+            cpu_usage = snapshot["values"]["cpu_percent"]
 
             # Get the memory details
-            memory = psutil.virtual_memory()
+            memory = snapshot["memory"]
 
             # Total physical memory (in GB)
-            total_memory_gb = memory.total / (1024 ** 3)
+            total_memory_gb = memory["total"] / (1024 ** 3)
 
             # Used memory (in GB)
-            used_memory_gb = memory.used / (1024 ** 3)
-
-            print(f"Total Memory: {total_memory_gb:.2f} GB")
-            print(f"Used Memory: {used_memory_gb:.2f} GB")
+            used_memory_gb = memory["used"] / (1024 ** 3)
 
             cpu_details = {
                 "id": 1,
@@ -336,68 +987,66 @@ class SystemData(APIView):
                 "fill": '#3872FA',
                 "percentage": int(cpu_usage),
                 "value": 'used of '+f"{total_memory_gb:.2f}"+' GB',
+                "per_core": snapshot["cpu_per_core"],
             }
             chart_data.append(cpu_details)
             # Memory information
-            memory = psutil.virtual_memory()
-            memory_details = {
-                "memory_usage": f"{memory.percent}%",
-                "total_usage": f"{memory.total / (1024 ** 3):.2f} GB",
-                "available_memory": f"{memory.available / (1024 ** 3):.2f} GB"
-            }
             chart_data.append(
                 {
                     "id": 2,
                     "title": 'MEMORY',
-                    "metric": f"{memory.available / (1024 ** 3):.2f} GB",
+                    "metric": f"{memory['available'] / (1024 ** 3):.2f} GB",
                     "fill": '#3872FA',
-                    "percentage": int(memory.percent),
-                    "value": 'used of ' + f"{memory.total / (1024 ** 3):.2f} GB",
+                    "percentage": int(memory["percent"]),
+                    "value": 'used of ' + f"{memory['total'] / (1024 ** 3):.2f} GB",
                 }
             )
             # Disk information
             disks_info = []
-            disks = psutil.disk_partitions()
-            for disk in disks:
-                usage = psutil.disk_usage(disk.mountpoint)
+            for disk in snapshot["disks"]:
+                if disk["status"] != "ok":
+                    # a stale or unreadable mount
+                    disks_info.append(
+                        {
+                            "mounted": f"Disk: {disk['device']} mounted on {disk['mountpoint']}",
+                            "status": disk["status"],
+                            "size": None,
+                            "used_memory": None,
+                            "used_percentage": None
+                        }
+                    )
+                    continue
                 disks_info.append(
                     {
-                        "mounted": f"Disk: {disk.device} mounted on {disk.mountpoint}",
-                        "size": f"{usage.total / (1024 ** 3):.2f} GB",
-                        "used_memory": f"{usage.used / (1024 ** 3):.2f} GB",
-                        "used_percentage": f"{usage.percent}%"
+                        "mounted": f"Disk: {disk['device']} mounted on {disk['mountpoint']}",
+                        "status": disk["status"],
+                        "size": f"{disk['total'] / (1024 ** 3):.2f} GB",
+                        "used_memory": f"{disk['used'] / (1024 ** 3):.2f} GB",
+                        "used_percentage": f"{disk['percent']}%"
                     }
                 )
 
             # Network interfaces
             interfaces_info = []
-            interfaces = psutil.net_if_addrs()
-            for interface_name, interface_addresses in interfaces.items():
-                print(f"Interface: {interface_name}")
-                address_info = []
-                for address in interface_addresses:
-                    address_info.append(
-                        {
-                            "family_name": f"{address.family.name}",
-                            "address": f"{address.address}",
-                        }
-                    )
+            for interface in snapshot["interfaces"]:
+                address_info = interface["addresses"]
                 interfaces_info.append(
                     {
                         "value": str(len(address_info))+'%',
                         "percentage": len(address_info),
                         "color": '#10b981',
-                        "name": interface_name,
-                        "address": address_info
+                        "name": interface["name"],
+                        "address": address_info,
+                        "bytes_sent": interface["bytes_sent"],
+                        "bytes_recv": interface["bytes_recv"],
                     }
                 )
 
-            # chart_data.append()
-
             system_info = {
                 "disk": disks_info,
                 "cpu_details": chart_data,
-                "interface": interfaces_info
+                "interface": interfaces_info,
+                "sampled_at": snapshot["ts"],
             }
             response = {"data": system_info, "message": "Data Found"}
             return JsonResponse(response, safe=False, status=200)
@@ -457,6 +1106,12 @@ class ListFile(APIView):
 
 class ExecutePcapFile(APIView):
     permission_classes = (IsAuthenticated,)
+    """
+        Queues a Zeek and Suricata analysis of every uploaded pcap in `filenames` and answers right
+        away with the queued jobs, follow them on `pcap/jobs/<job_id>`. With an `execution_type`
+        other than 1 the files are removed instead.
+    """
+
     def post(self, request):
         try:
             data = request.data
@@ -468,30 +1123,49 @@ class ExecutePcapFile(APIView):
                 return JsonResponse({'error': 'Filenames must be an array.'}, status=400)
 
             upload_dir = 'uploads'
-            results = []
+            jobs = []
+            errors = []
 
             for filename in filenames:
                 file_path = os.path.join(upload_dir, filename)
                 if not os.path.isfile(file_path) or not file_path.endswith('.pcap'):
-                    results.append({'filename': filename, 'error': 'File does not exist or is not a .pcap file.'})
+                    errors.append({'filename': filename, 'error': 'File does not exist or is not a .pcap file.'})
                     continue
                 if execution_type == 1:
-                    try:
-                        # Constructing and running the Zeek command
-                        zeek_command = f"{zeek_command_base} {file_path}"
-                        print(f"Running Zeek on {file_path}...")
-                        run_command(zeek_command)
-
-                        # Constructing and running the Suricata command
-                        suricata_command = f"{suricata_command_base} {file_path} -l /var/log/suricata"
-                        print(f"Running Suricata on {file_path}...")
-                        run_command(suricata_command)
-                    except Exception as e:
-                        results.append({'filename': filename, 'error': str(e)})
+                    jobs.append(format_job(pcap_jobs.submit(filename, file_path)))
                 else:
                     os.remove(file_path)
                     print("File Removed Successfully..!!")
-            return JsonResponse({"message": "File Executed Successfully"}, status=200)
+            if execution_type != 1:
+                return JsonResponse({"message": "File Removed Successfully", "errors": errors}, status=200)
+            response = {"data": {"jobs": jobs, "errors": errors}, "message": "Analysis Queued"}
+            return JsonResponse(response, safe=False, status=202 if jobs else 400)
+        except Exception as ex:
+            print("Error on line {}".format(sys.exc_info()[-1].tb_lineno), type(ex).__name__, ex)
+            error = {
+                "message": "something went wrong"
+            }
+            return JsonResponse(error, safe=False, status=500)
+
+
+class PcapJobList(APIView):
+    permission_classes = (IsAuthenticated,)
+    """
+        Latest pcap analysis jobs first, `status` keeps only the jobs in that state and `size`
+        caps the count (100 by default).
+    """
+
+    def get(self, request):
+        try:
+            jobs = PcapJob.objects.order_by("-created_at", "-id")
+            status = request.GET.get("status")
+            if status:
+                jobs = jobs.filter(status=status)
+            size = min(int(request.GET.get("size", 100)), 1000)
+            data = [format_job(job) for job in jobs[:size]]
+            response = {"data": data, "message": "Data Found" if data else "No Data Found"}
+            return JsonResponse(response, safe=False, status=200)
+
         except Exception as ex:
             print("Error on line {}".format(sys.exc_info()[-1].tb_lineno), type(ex).__name__, ex)
             error = {
@@ -499,3 +1173,52 @@ class ExecutePcapFile(APIView):
             }
             return JsonResponse(error, safe=False, status=500)
 
+
+class PcapJobDetail(APIView):
+    permission_classes = (IsAuthenticated,)
+    """
+        Status, progress and per tool exit code and duration of a pcap analysis job.
+    """
+
+    def get(self, request, job_id):
+        try:
+            job = PcapJob.objects.filter(id=job_id).first()
+            if job is None:
+                response = {"data": {}, "message": "No Data Found"}
+                return JsonResponse(response, safe=False, status=404)
+            response = {"data": format_job(job), "message": "Data Found"}
+            return JsonResponse(response, safe=False, status=200)
+
+        except Exception as ex:
+            print("Error on line {}".format(sys.exc_info()[-1].tb_lineno), type(ex).__name__, ex)
+            error = {
+                "message": "something went wrong"
+            }
+            return JsonResponse(error, safe=False, status=500)
+
+
+class PcapJobCancel(APIView):
+    permission_classes = (IsAuthenticated,)
+    """
+        Cancels a pcap analysis job: a queued job never starts, the tools of a running one are
+        killed. Finished jobs are left as they are.
+    """
+
+    def post(self, request, job_id):
+        try:
+            job = pcap_jobs.cancel(job_id)
+            if job is None:
+                response = {"data": {}, "message": "No Data Found"}
+                return JsonResponse(response, safe=False, status=404)
+            if job.status not in ("queued", "running", "cancelled"):
+                response = {"data": format_job(job), "message": "Job Already Finished"}
+                return JsonResponse(response, safe=False, status=409)
+            response = {"data": format_job(job), "message": "Cancellation Requested"}
+            return JsonResponse(response, safe=False, status=202)
+
+        except Exception as ex:
+            print("Error on line {}".format(sys.exc_info()[-1].tb_lineno), type(ex).__name__, ex)
+            error = {
+                "message": "something went wrong"
+            }
+            return JsonResponse(error, safe=False, status=500)
@@ -0,0 +1,123 @@
+import asyncio
+import json
+import weakref
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse
+from django.views import View
+from elasticsearch import AsyncElasticsearch
+from rest_framework.authtoken.models import Token
+
+from .metrics import instrument_transport
+
+# One AsyncElasticsearch client (and so one connection pool) per event loop. Under the ASGI
+# server there is a single loop, so every async view shares the same pool. `AsyncAPIView` only
+# answers on the ASGI server, where that loop lives as long as the process.
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = AsyncElasticsearch(
+            [
+                {
+                    'host': settings.ELASTIC_URL,
+                    'port': 9200,
+                    'scheme': 'https',
+                }
+            ],
+            verify_certs=False,
+            http_auth=(settings.ELASTIC_USERNAME, settings.ELASTIC_PASSWORD),
+            connections_per_node=settings.ELASTIC_ASYNC_POOL_SIZE,
+        )
+        instrument_transport(client.transport)
+        _clients[loop] = client
+    return client
+
+
+# Salt of the signed tokens handed out for the views that take `query_token_max_age`
+query_token_salt = "elastic_search_api_new.async_api.query_token"
+
+
+# Function to sign a short-lived token for `user`, for clients that can not send an Authorization header
+def sign_query_token(user):
+    return signing.TimestampSigner(salt=query_token_salt).sign(str(user.pk))
+
+
+async def get_query_token_user(request, max_age):
+    """
+        Returns the active user of a `token` query parameter signed by `sign_query_token` less than
+        `max_age` seconds ago, or None.
+    """
+    token = request.GET.get("token")
+    if not token:
+        return None
+    try:
+        user_id = signing.TimestampSigner(salt=query_token_salt).unsign(token, max_age=max_age)
+    except signing.BadSignature:
+        return None
+    return await User.objects.filter(pk=user_id, is_active=True).afirst()
+
+
+async def get_token_user(request):
+    """
+        Same lookup as `rest_framework.authentication.TokenAuthentication`, without leaving the
+        event loop: returns the active user for an `Authorization: Token <key>` header or None.
+    """
+    header = request.headers.get("Authorization", "").split()
+    if len(header) != 2 or header[0].lower() != "token":
+        return None
+    try:
+        token = await Token.objects.select_related("user").aget(key=header[1])
+    except Token.DoesNotExist:
+        return None
+    if not token.user.is_active:
+        return None
+    return token.user
+
+
+class AsyncAPIView(View):
+    """
+        Base class for the async views served through the ASGI application.
+
+        Handlers are `async def` methods like on a Django `View`. Requests are authenticated with
+        the same tokens as the DRF views unless `authentication_required` is False, and a JSON body
+        is parsed into `request.data`. Views setting `query_token_max_age` also accept a `token`
+        query parameter from `sign_query_token`, valid for that many seconds.
+
+        The WSGI server answers these routes with a 404: it runs every async request on a new event
+        loop, which would leave an Elasticsearch client and its connections behind per request, and
+        it buffers streamed responses.
+    """
+    authentication_required = True
+    query_token_max_age = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        if not isinstance(request, ASGIRequest):
+            return JsonResponse({"message": "only served by the ASGI application"}, safe=False, status=404)
+        if self.authentication_required:
+            user = await get_token_user(request)
+            if user is None and self.query_token_max_age:
+                user = await get_query_token_user(request, self.query_token_max_age)
+            if user is None:
+                return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+            request.user = user
+
+        request.data = {}
+        if request.body:
+            try:
+                request.data = json.loads(request.body)
+            except ValueError:
+                return JsonResponse({"message": "request body is not valid JSON"}, safe=False, status=400)
+        return await super().dispatch(request, *args, **kwargs)
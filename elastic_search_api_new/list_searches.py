@@ -0,0 +1,62 @@
+"""
+Searches behind the role and user list views, shared by the sync and async views and by `BatchSearch`.
+"""
+from elastic_search_api_new.query_builder import build_query, build_search, prefix_filter
+
+
+# Define the index name
+user_index_name = "users"
+role_index_name = "roles"
+
+
+# Fields of the role documents returned by the list view
+role_fields = ["role_name", "access"]
+
+
+# Function to build the index and search body of the role list from its request parameters
+def build_role_search(params):
+    size = int(params.get("size", 10))
+    page = int(params.get("page", 0))
+    search_query = build_search(
+        build_query([prefix_filter("role_name", params.get("search", ""))]),
+        size=size,
+        page=page,
+        source=role_fields,
+    )
+    return role_index_name, search_query
+
+
+def format_role_hit(_res):
+    return {
+        "id": _res['_id'],
+        "role_name": _res['_source']['role_name'],
+        "access": _res['_source']['access'],
+    }
+
+
+# Fields of the user documents returned by the list view
+user_fields = ["name", "email", "role", "status", "permission"]
+
+
+# Function to build the index and search body of the user list from its request parameters
+def build_user_search(params):
+    size = int(params.get("size", 10))
+    page = int(params.get("page", 0))
+    search_query = build_search(
+        build_query([prefix_filter("name", params.get("search", ""))]),
+        size=size,
+        page=page,
+        source=user_fields,
+    )
+    return user_index_name, search_query
+
+
+def format_user_hit(_res):
+    return {
+        "id": _res['_id'],
+        "name": _res['_source']['name'],
+        "email": _res['_source']['email'],
+        "role": _res['_source']['role'],
+        "status": _res['_source']['status'],
+        "permission": _res['_source']['permission'],
+    }
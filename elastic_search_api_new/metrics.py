@@ -0,0 +1,210 @@
+"""
+In-process metrics rendered in the OpenMetrics text format by the `/metrics` endpoint.
+
+Counters and histograms are updated in place by the request middleware and the Elasticsearch
+transport wrapper. Values that are already kept somewhere else (the host and container samplers)
+are read at render time through collectors registered with `registry.add_collector`.
+"""
+import asyncio
+import functools
+import threading
+import time
+
+from django.utils.decorators import sync_and_async_middleware
+
+latency_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+# Function to format a label set, `labels` is a list of (name, value) pairs
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in labels
+    ) + "}"
+
+
+# Function to format a sample value
+def format_value(value):
+    if value is None:
+        return "NaN"
+    if isinstance(value, float) and value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self.lock:
+            self.values[labelvalues] = self.values.get(labelvalues, 0) + amount
+
+    def render(self, lines):
+        lines.append("# TYPE {} counter".format(self.name))
+        lines.append("# HELP {} {}".format(self.name, self.documentation))
+        with self.lock:
+            values = list(self.values.items())
+        for labelvalues, value in values:
+            labels = list(zip(self.labelnames, labelvalues))
+            lines.append("{}_total{} {}".format(self.name, format_labels(labels), format_value(value)))
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames, buckets=latency_buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        with self.lock:
+            series = self.values.get(labelvalues)
+            if series is None:
+                # one count per bucket, then the overall count and sum
+                series = self.values[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[position] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self, lines):
+        lines.append("# TYPE {} histogram".format(self.name))
+        lines.append("# HELP {} {}".format(self.name, self.documentation))
+        with self.lock:
+            values = [(labelvalues, list(series)) for labelvalues, series in self.values.items()]
+        for labelvalues, series in values:
+            labels = list(zip(self.labelnames, labelvalues))
+            for position, bound in enumerate(self.buckets):
+                lines.append("{}_bucket{} {}".format(
+                    self.name, format_labels(labels + [("le", format_value(float(bound)))]), series[position]))
+            lines.append("{}_bucket{} {}".format(self.name, format_labels(labels + [("le", "+Inf")]), series[-2]))
+            lines.append("{}_count{} {}".format(self.name, format_labels(labels), series[-2]))
+            lines.append("{}_sum{} {}".format(self.name, format_labels(labels), format_value(series[-1])))
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """
+            `collector()` returns (name, type, help, samples) tuples, samples being a list of
+            (labels, value) pairs with labels a list of (name, value) pairs. Counter samples get
+            the `_total` suffix.
+        """
+        self.collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            metric.render(lines)
+        for collector in self.collectors:
+            try:
+                families = collector()
+            except Exception as ex:
+                print("Unable to collect metrics", type(ex).__name__, ex)
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append("# TYPE {} {}".format(name, kind))
+                lines.append("# HELP {} {}".format(name, documentation))
+                sample_name = name + "_total" if kind == "counter" else name
+                for labels, value in samples:
+                    lines.append("{}{} {}".format(sample_name, format_labels(labels), format_value(value)))
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+http_requests = registry.register(Counter(
+    "http_requests", "HTTP requests handled, by view, method and status.", ["view", "method", "status"]))
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "Time to build the response, by view and method.", ["view", "method"]))
+elasticsearch_request_duration = registry.register(Histogram(
+    "elasticsearch_request_duration_seconds", "Elasticsearch request latency, by API and status.",
+    ["endpoint", "status"]))
+
+
+# Function to name an Elasticsearch request after its API (`_search`, `_bulk`, `_doc`...) rather than its path,
+# so index names do not end up in the labels
+def elasticsearch_endpoint(target):
+    path = target.split("?", 1)[0]
+    for part in path.strip("/").split("/"):
+        if part.startswith("_"):
+            return part
+    return "_root" if path.strip("/") == "" else "_index"
+
+
+def record_request(request, response, started):
+    match = getattr(request, "resolver_match", None)
+    view = match.url_name if match is not None and match.url_name else "unmatched"
+    http_requests.inc(view, request.method, response.status_code)
+    http_request_duration.observe(time.perf_counter() - started, view, request.method)
+
+
+@sync_and_async_middleware
+def request_metrics_middleware(get_response):
+    """
+        Counts the requests and records their latency per view.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            started = time.perf_counter()
+            response = await get_response(request)
+            record_request(request, response, started)
+            return response
+    else:
+        def middleware(request):
+            started = time.perf_counter()
+            response = get_response(request)
+            record_request(request, response, started)
+            return response
+    return middleware
+
+
+def instrument_transport(transport):
+    """
+        Times every request sent through an elastic_transport (Async)Transport.
+    """
+    perform_request = transport.perform_request
+
+    if asyncio.iscoroutinefunction(perform_request):
+        @functools.wraps(perform_request)
+        async def timed(method, target, *args, **kwargs):
+            started = time.perf_counter()
+            status = "error"
+            try:
+                response = await perform_request(method, target, *args, **kwargs)
+                status = response.meta.status
+                return response
+            finally:
+                elasticsearch_request_duration.observe(
+                    time.perf_counter() - started, elasticsearch_endpoint(target), status)
+    else:
+        @functools.wraps(perform_request)
+        def timed(method, target, *args, **kwargs):
+            started = time.perf_counter()
+            status = "error"
+            try:
+                response = perform_request(method, target, *args, **kwargs)
+                status = response.meta.status
+                return response
+            finally:
+                elasticsearch_request_duration.observe(
+                    time.perf_counter() - started, elasticsearch_endpoint(target), status)
+
+    transport.perform_request = timed
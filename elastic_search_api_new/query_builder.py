@@ -0,0 +1,117 @@
+"""
+Query builders shared by the elastic_apis and users_api views.
+
+Every constraint is emitted in the `filter` context of a `bool` query. Filter clauses are not
+scored and Elasticsearch can keep them in its node query cache, so repeated dashboard queries
+are cheaper on the cluster than the old `must` + `minimum_should_match` bodies. Builders for a
+single clause return None when there is nothing to filter on, `build_query` drops those.
+"""
+
+# Sorting on index order is the cheapest order Elasticsearch can return hits in
+default_sort = ["_doc"]
+
+
+def prefix_filter(field, value):
+    if value is None or value == "":
+        return None
+    return {"match_phrase_prefix": {field: value}}
+
+
+def phrase_filter(field, value):
+    if value is None or value == "":
+        return None
+    return {"match_phrase": {field: value}}
+
+
+def match_filter(field, value):
+    if value is None or value == "":
+        return None
+    return {"match": {field: value}}
+
+
+def ids_filter(*ids):
+    ids = [str(_id) for _id in ids if _id]
+    if len(ids) == 0:
+        return None
+    return {"ids": {"values": ids}}
+
+
+def range_filter(field, gte=None, lte=None, format=None):
+    bounds = {}
+    if gte:
+        bounds["gte"] = gte
+    if lte:
+        bounds["lte"] = lte
+    if len(bounds) == 0:
+        return None
+    if format:
+        bounds["format"] = format
+    return {"range": {field: bounds}}
+
+
+def build_query(filters=()):
+    filters = [_filter for _filter in filters if _filter is not None]
+    if len(filters) == 0:
+        return {"match_all": {}}
+    return {"bool": {"filter": filters}}
+
+
+def build_search(query, size=10, page=0, source=None, sort=None, track_total_hits=False):
+    """
+        Build a search body for `query`. `page` is zero based and counted in pages of `size`,
+        `source` is the list of `_source` fields to return (None returns the whole document, False
+        none of it). `sort` defaults to index order and total hit counting is off unless asked for.
+    """
+    body = {
+        "query": query,
+        "size": size,
+        "from": page * size,
+        "sort": sort if sort is not None else default_sort,
+        "track_total_hits": track_total_hits,
+    }
+    if source is not None:
+        body["_source"] = source
+    return body
+
+
+def hits_filter_path(fields=None):
+    """
+        filter_path for the hits of a search, projecting `_source` down to `fields` (None keeps the
+        whole `_source`, an empty list drops it).
+    """
+    filter_path = ["hits.hits._id"]
+    if fields is None:
+        filter_path.append("hits.hits._source")
+    else:
+        filter_path.extend("hits.hits._source." + field for field in fields)
+    return filter_path
+
+
+def build_aggregation(query, aggs):
+    """
+        Build a search body that only returns `aggs`, no hits are fetched or counted.
+    """
+    return {
+        "query": query,
+        "size": 0,
+        "track_total_hits": False,
+        "aggs": aggs,
+    }
+
+
+def terms_agg(field, size=10):
+    return {"terms": {"field": field, "size": size}}
+
+
+def date_histogram_agg(field, interval, min_doc_count=1):
+    return {"date_histogram": {"field": field, "fixed_interval": interval, "min_doc_count": min_doc_count}}
+
+
+def composite_agg(name, field, size=100, after=None):
+    composite = {
+        "size": size,
+        "sources": [{name: {"terms": {"field": field}}}],
+    }
+    if after is not None:
+        composite["after"] = {name: after}
+    return {"composite": composite}
@@ -0,0 +1,170 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from fnmatch import fnmatchcase
+
+from django.conf import settings
+from elastic_search_api_new.settings import es_url
+from elastic_search_api_new.single_flight import search_flight, async_search_flight
+
+
+# Function to tell whether a write to `index` can change the results cached for `pattern`. The backing indices of a
+# data stream (.ds-<stream>-<date>-<generation>) count as the stream.
+def covers(pattern, index):
+    names = [index, index[len(".ds-"):]] if index.startswith(".ds-") else [index]
+    return any(name == pattern or fnmatchcase(name, pattern) for name in names)
+
+
+class SearchCache:
+    """
+        Bounded LRU cache for Elasticsearch search responses.
+
+        Entries are keyed by the index the view asked for (a pattern such as `filebeat-*`, not the
+        backing indices a time range was resolved to), the normalized query body and the
+        filter_path, and expire after the TTL configured for that index in `SEARCH_CACHE_TTL`
+        (falling back to the "default" entry). Once `max_entries` is reached the least recently used entry is
+        evicted. Writes call `invalidate` with the index they wrote to, which drops every cached
+        entry whose index or index pattern covers it (a write to `filebeat-8.13.2` clears the
+        `filebeat-*` entries). A result read before an invalidation of its index is not stored, so a
+        search overlapping a write can not put the old documents back.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # bumped by every invalidation, with the value it had for the last invalidation of each index
+        self.generation = 0
+        self.invalidated = {}
+
+    @staticmethod
+    def make_key(index, body, filter_path=None):
+        return (
+            index,
+            json.dumps(body, sort_keys=True, separators=(",", ":"), default=str),
+            tuple(sorted(filter_path)) if filter_path else (),
+        )
+
+    def ttl_for(self, index):
+        return self.ttl.get(index, self.ttl.get("default", 0))
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def current_generation(self):
+        """
+            Read before the search and handed to `put` with its result.
+        """
+        with self.lock:
+            return self.generation
+
+    def invalidated_since(self, pattern, generation):
+        for index, invalidated_at in self.invalidated.items():
+            if invalidated_at > generation and (index is None or covers(pattern, index)):
+                return True
+        return False
+
+    def put(self, key, value, generation=None):
+        ttl = self.ttl_for(key[0])
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        with self.lock:
+            if generation is not None and self.invalidated_since(key[0], generation):
+                return
+            self.entries[key] = (time.monotonic() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, index=None):
+        with self.lock:
+            self.generation += 1
+            if index is None:
+                self.invalidated.clear()
+            self.invalidated[index] = self.generation
+            if index is None:
+                stale = list(self.entries)
+            else:
+                stale = [key for key in self.entries if covers(key[0], index)]
+            for key in stale:
+                del self.entries[key]
+            self.invalidations += len(stale)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "ttl": self.ttl,
+            }
+
+
+search_cache = SearchCache(settings.SEARCH_CACHE_MAX_ENTRIES, settings.SEARCH_CACHE_TTL)
+
+
+def cached_search(index, body, filter_path=None, cache_index=None):
+    """
+        Drop-in replacement for `es_url.search(index=..., body=..., filter_path=...)` for the
+        read-only list views, answering repeated identical queries from `search_cache`.
+        Concurrent misses for the same key share a single Elasticsearch call. When `index` was
+        resolved from a pattern, pass the pattern as `cache_index`: it picks the TTL and the
+        invalidations of the entry.
+    """
+    key = search_cache.make_key(cache_index or index, body, filter_path)
+    res = search_cache.get(key)
+    if res is None:
+        res = search_flight.do(key, lambda: _search(key, index, body, filter_path))
+    return res
+
+
+def _search(key, index, body, filter_path):
+    generation = search_cache.current_generation()
+    res = es_url.search(index=index, body=body, filter_path=filter_path)
+    # keep the plain response body, the transport wrapper is not meant to be shared
+    res = getattr(res, "body", res)
+    search_cache.put(key, res, generation)
+    return res
+
+
+async def async_cached_search(client, index, body, filter_path=None, cache_index=None):
+    """
+        `cached_search` for async views, `client` is an `AsyncElasticsearch` instance.
+    """
+    key = search_cache.make_key(cache_index or index, body, filter_path)
+    res = search_cache.get(key)
+    if res is None:
+        res = await async_search_flight.do(key, lambda: _async_search(client, key, index, body, filter_path))
+    return res
+
+
+async def _async_search(client, key, index, body, filter_path):
+    generation = search_cache.current_generation()
+    res = await client.search(index=index, body=body, filter_path=filter_path)
+    res = getattr(res, "body", res)
+    search_cache.put(key, res, generation)
+    return res
@@ -14,6 +14,7 @@ from pathlib import Path
 from dotenv import load_dotenv
 import os
 from elasticsearch import Elasticsearch
+from elastic_search_api_new.metrics import instrument_transport
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,96 @@ es_url=Elasticsearch(
     verify_certs=False,  # Disable certificate verification
     http_auth= (ELASTIC_USERNAME, ELASTIC_PASSWORD)  # Basic Auth credentials
 )
+# Elasticsearch latencies are exposed on /metrics
+instrument_transport(es_url.transport)
+
+# Connections per Elasticsearch node in the pool shared by the async views (see async_api.py)
+ELASTIC_ASYNC_POOL_SIZE = int(os.getenv("ELASTIC_ASYNC_POOL_SIZE", 100))
+
+# Query result cache in front of the list views, TTLs are in seconds per index (or index pattern)
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", 512))
+SEARCH_CACHE_TTL = {
+    "default": int(os.getenv("SEARCH_CACHE_TTL", 5)),
+    "filebeat-*": int(os.getenv("SEARCH_CACHE_FILEBEAT_TTL", 5)),
+    "roles": int(os.getenv("SEARCH_CACHE_ROLES_TTL", 60)),
+    "users": int(os.getenv("SEARCH_CACHE_USERS_TTL", 60)),
+}
+
+# Background refresh of the per index @timestamp bounds used to narrow time range queries on filebeat-*,
+# indices without new documents for INDEX_RESOLVER_STABLE_AFTER seconds are not read again
+INDEX_RESOLVER_REFRESH_INTERVAL = int(os.getenv("INDEX_RESOLVER_REFRESH_INTERVAL", 60))
+INDEX_RESOLVER_STABLE_AFTER = int(os.getenv("INDEX_RESOLVER_STABLE_AFTER", 3600))
+
+# Data stream SystemData writes to, it matches filebeat-* so readers see every generation. Rollover and
+# retention are handled by its lifecycle policy, run `manage.py bootstrap_rollover` after changing them.
+SYSTEM_DATA_STREAM = os.getenv("SYSTEM_DATA_STREAM", "filebeat-systemdata")
+ROLLOVER_MAX_PRIMARY_SHARD_SIZE = os.getenv("ROLLOVER_MAX_PRIMARY_SHARD_SIZE", "50gb")
+ROLLOVER_MAX_AGE = os.getenv("ROLLOVER_MAX_AGE", "1d")
+ROLLOVER_RETENTION_DAYS = int(os.getenv("ROLLOVER_RETENTION_DAYS", 30))
+
+# Buffered bulk ingest behind SystemData.post, a flush happens at whichever threshold is hit first
+INGEST_BULK_MAX_DOCS = int(os.getenv("INGEST_BULK_MAX_DOCS", 500))
+INGEST_BULK_MAX_BYTES = int(os.getenv("INGEST_BULK_MAX_BYTES", 5 * 1024 * 1024))
+INGEST_BULK_FLUSH_INTERVAL = float(os.getenv("INGEST_BULK_FLUSH_INTERVAL", 1.0))
+INGEST_BULK_MAX_RETRIES = int(os.getenv("INGEST_BULK_MAX_RETRIES", 3))
+INGEST_BULK_MAX_BUFFERED = int(os.getenv("INGEST_BULK_MAX_BUFFERED", 50000))
+
+# On-disk write-ahead spool for ingest, events are acknowledged once fsync'd here and shipped in the
+# background. Leave INGEST_SPOOL_DIR empty to write straight to the bulk ingester. A directory is used by one
+# process only, give the WSGI and ASGI servers different ones.
+INGEST_SPOOL_DIR = os.getenv("INGEST_SPOOL_DIR", "")
+INGEST_SPOOL_SEGMENT_BYTES = int(os.getenv("INGEST_SPOOL_SEGMENT_BYTES", 64 * 1024 * 1024))
+INGEST_SPOOL_BATCH_DOCS = int(os.getenv("INGEST_SPOOL_BATCH_DOCS", 1000))
+
+# Keyword field holding the hostname, used by the hostname autocomplete and the aggregation endpoints
+HOSTNAME_KEYWORD_FIELD = os.getenv("HOSTNAME_KEYWORD_FIELD", "hostname.keyword")
+HOSTNAME_INDEX_REFRESH_INTERVAL = int(os.getenv("HOSTNAME_INDEX_REFRESH_INTERVAL", 30))
+HOSTNAME_INDEX_FULL_REFRESH_INTERVAL = int(os.getenv("HOSTNAME_INDEX_FULL_REFRESH_INTERVAL", 3600))
+
+# Docker stats are collected by a bounded pool of workers, a container not answering within the timeout is
+# returned without its metrics
+DOCKER_STATS_WORKERS = int(os.getenv("DOCKER_STATS_WORKERS", 16))
+DOCKER_STATS_TIMEOUT = float(os.getenv("DOCKER_STATS_TIMEOUT", 5))
+# Seconds between two passes of the container sampler over the docker inventory, a pass makes no docker call
+CONTAINER_SAMPLER_REFRESH_INTERVAL = int(os.getenv("CONTAINER_SAMPLER_REFRESH_INTERVAL", 1))
+
+# Container restarts run in the background, this many at a time, docker kills a container that did not stop
+# within CONTAINER_RESTART_TIMEOUT seconds
+CONTAINER_RESTART_CONCURRENCY = int(os.getenv("CONTAINER_RESTART_CONCURRENCY", 4))
+CONTAINER_RESTART_TIMEOUT = int(os.getenv("CONTAINER_RESTART_TIMEOUT", 10))
+
+# Seconds between two host metric samples
+HOST_SAMPLER_INTERVAL = float(os.getenv("HOST_SAMPLER_INTERVAL", 1))
+
+# Disk usage probing: mounts not answering within DISK_PROBE_TIMEOUT seconds are reported unavailable, results
+# are reused for DISK_PROBE_TTL seconds. Comma separated fstypes and mountpoint patterns (e.g. /snap/*) to skip.
+DISK_PROBE_TIMEOUT = float(os.getenv("DISK_PROBE_TIMEOUT", 2))
+DISK_PROBE_TTL = float(os.getenv("DISK_PROBE_TTL", 30))
+DISK_EXCLUDE_FSTYPES = [fstype for fstype in os.getenv("DISK_EXCLUDE_FSTYPES", "").split(",") if fstype]
+DISK_EXCLUDE_PATHS = [path for path in os.getenv("DISK_EXCLUDE_PATHS", "").split(",") if path]
+
+# Host and container metrics history, recorded every METRICS_HISTORY_INTERVAL seconds into downsampling
+# tiers given as step:buckets pairs, 1s for 10 minutes, 10s for 6 hours and 1 minute for 7 days by default
+METRICS_HISTORY_INTERVAL = int(os.getenv("METRICS_HISTORY_INTERVAL", 1))
+METRICS_HISTORY_TIERS = [
+    tuple(int(part) for part in tier.split(":"))
+    for tier in os.getenv("METRICS_HISTORY_TIERS", "1:600,10:2160,60:10080").split(",")
+]
+# Seconds between two pushes of the metrics stream
+METRICS_STREAM_INTERVAL = float(os.getenv("METRICS_STREAM_INTERVAL", 1))
+# Seconds a metrics stream token stays valid, EventSource clients can not send the Authorization header
+METRICS_STREAM_TOKEN_MAX_AGE = int(os.getenv("METRICS_STREAM_TOKEN_MAX_AGE", 300))
+
+# Pcap analyses run in the background, PCAP_WORKERS at a time (one per CPU by default). The tool output
+# and the lock electing the server process that runs them live in PCAP_OUTPUT_DIR.
+PCAP_WORKERS = int(os.getenv("PCAP_WORKERS", 0)) or os.cpu_count()
+PCAP_OUTPUT_DIR = os.getenv("PCAP_OUTPUT_DIR", "pcap_output")
+# Only processes started with PCAP_RUN_JOBS=true (the servers in ecosystem.config.js) run the queued pcap jobs,
+# scripts and management commands importing the app only queue them
+PCAP_RUN_JOBS = os.getenv("PCAP_RUN_JOBS", "false").lower() == "true"
+# Seconds each analyzer may run on one pcap before it is stopped
+PCAP_ZEEK_TIMEOUT = int(os.getenv("PCAP_ZEEK_TIMEOUT", 3600))
+PCAP_SURICATA_TIMEOUT = int(os.getenv("PCAP_SURICATA_TIMEOUT", 3600))
 
 
 
@@ -93,6 +184,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'elastic_search_api_new.metrics.request_metrics_middleware',
 ]
 
 ROOT_URLCONF = 'elastic_search_api_new.urls'
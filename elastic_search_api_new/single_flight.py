@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import weakref
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+        Coalesces identical concurrent calls made from worker threads.
+
+        The first caller for a key runs the function, every caller arriving with the same key
+        while that call is still in flight waits for it and receives the same result (or the
+        same exception). Nothing is kept once the call finishes, caching is left to `SearchCache`.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        with self.lock:
+            call = self.calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.shared += 1
+                leader = False
+            else:
+                call = _Call()
+                self.calls[key] = call
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as ex:
+            call.error = ex
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self):
+        with self.lock:
+            return {"executed": self.executed, "shared": self.shared, "in_flight": len(self.calls)}
+
+
+class AsyncSingleFlight:
+    """
+        Same as `SingleFlight` for coroutines: concurrent awaits with an identical key on the same
+        event loop share a single task. Tasks are kept per loop, a task can only be awaited from
+        the loop it runs on.
+    """
+
+    def __init__(self):
+        self.tasks = weakref.WeakKeyDictionary()
+        self.executed = 0
+        self.shared = 0
+
+    async def do(self, key, coro_fn):
+        tasks = self.tasks.setdefault(asyncio.get_running_loop(), {})
+        task = tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(coro_fn())
+            tasks[key] = task
+            self.executed += 1
+            task.add_done_callback(lambda _task: tasks.pop(key, None))
+        else:
+            self.shared += 1
+        # shield so a cancelled waiter does not cancel the call the other waiters depend on
+        return await asyncio.shield(task)
+
+    def stats(self):
+        in_flight = sum(len(tasks) for tasks in list(self.tasks.values()))
+        return {"executed": self.executed, "shared": self.shared, "in_flight": in_flight}
+
+
+search_flight = SingleFlight()
+async_search_flight = AsyncSingleFlight()
@@ -18,16 +18,38 @@ from django.contrib import admin
 from django.urls import path
 from elastic_apis import views
 from users_api import views as user_view
+from elastic_apis import async_views
+from users_api import async_views as user_async_views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('get/data', views.ElasticData.as_view(), name='ElasticData'),
+    path('export/data', views.ExportData.as_view(), name='ExportData'),
+    path('batch', views.BatchSearch.as_view(), name='BatchSearch'),
+    path('aggregate/data', views.AggregateData.as_view(), name='AggregateData'),
+    path('hostnames/autocomplete', views.HostnameAutocomplete.as_view(), name='HostnameAutocomplete'),
+    path('cache/stats', views.SearchCacheStats.as_view(), name='SearchCacheStats'),
     path('system/process/data', views.SystemProcessData.as_view(), name='SystemProcessData'),
+    path('system/process/restart/<str:job_id>', views.RestartJobStatus.as_view(), name='RestartJobStatus'),
     path('system/data', views.SystemData.as_view(), name='SystemData'),
+    path('system/metrics/history', views.MetricsHistoryRange.as_view(), name='MetricsHistoryRange'),
+    path('system/metrics/stream/token', views.MetricsStreamToken.as_view(), name='MetricsStreamToken'),
+    path('metrics', views.MetricsExposition.as_view(), name='MetricsExposition'),
+    path('ingest/ndjson', views.IngestNdjson.as_view(), name='IngestNdjson'),
+    path('ingest/stats', views.IngestStats.as_view(), name='IngestStats'),
     path('upload/file', views.UploadPcapFile.as_view(), name='UploadPcapFile'),
     path('list-files/', views.ListFile.as_view(), name='ListFile'),
     path('execute/pcap/', views.ExecutePcapFile.as_view(), name='ExecutePcapFile'),
+    path('pcap/jobs', views.PcapJobList.as_view(), name='PcapJobList'),
+    path('pcap/jobs/<int:job_id>', views.PcapJobDetail.as_view(), name='PcapJobDetail'),
+    path('pcap/jobs/<int:job_id>/cancel', views.PcapJobCancel.as_view(), name='PcapJobCancel'),
     path('roles', user_view.AccessRoles.as_view(), name='AccessRoles'),
     path('users', user_view.UsersData.as_view(), name='UsersData'),
     path('authenticate', user_view.UserAuthenticate.as_view(), name='UserAuthenticate'),
+    # async views on the pooled AsyncElasticsearch client, meant to be served by the ASGI application
+    path('async/get/data', async_views.AsyncElasticData.as_view(), name='AsyncElasticData'),
+    path('async/system/data', async_views.AsyncSystemData.as_view(), name='AsyncSystemData'),
+    path('async/system/metrics/stream', async_views.AsyncMetricsStream.as_view(), name='AsyncMetricsStream'),
+    path('async/roles', user_async_views.AsyncAccessRoles.as_view(), name='AsyncAccessRoles'),
+    path('async/users', user_async_views.AsyncUsersData.as_view(), name='AsyncUsersData'),
 ]
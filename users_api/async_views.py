@@ -0,0 +1,262 @@
+import datetime
+import sys
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.http import JsonResponse
+
+from elastic_search_api_new.async_api import AsyncAPIView, get_async_client
+from elastic_search_api_new.search_cache import async_cached_search, search_cache
+from elastic_search_api_new.query_builder import build_query, build_search, phrase_filter, ids_filter, \
+    hits_filter_path
+from elastic_search_api_new.list_searches import user_index_name, role_index_name, build_role_search, \
+    format_role_hit, role_fields, build_user_search, format_user_hit, user_fields
+from .views import validate_body, role_rules, role_patch_rules, user_rules, user_patch_rules
+
+
+# Async versions of AccessRoles and UsersData, served through the ASGI application.
+# They take the same parameters and return the same responses as their counterparts in views.py.
+class AsyncAccessRoles(AsyncAPIView):
+    async def post(self, request):
+        try:
+            data = request.data
+            error = validate_body(data, role_rules)
+            if error:
+                return JsonResponse({'error': error}, status=400)
+            name = data.get("name")
+            access = data.get("access")
+            client = get_async_client()
+
+            ## first need to check if we have already added role in database with the same name
+            search_query = build_search(build_query([phrase_filter("role_name", name)]), size=1, source=False)
+
+            res_filter_parameters = await client.search(
+                index=role_index_name,
+                body=search_query,
+                filter_path=hits_filter_path([]),
+            )
+            if len(res_filter_parameters) == 0:
+                json_data = {
+                    "role_name": name,
+                    "access": access,
+                    "timestamp": int(datetime.datetime.now().timestamp())
+                }
+                await client.index(index=role_index_name, body=json_data, op_type="create")
+                search_cache.invalidate(role_index_name)
+
+                response = {
+                    "message": "Successfully Added the role"
+                }
+                return JsonResponse(response, safe=False, status=201)
+            else:
+                response = {
+                    "message": "Role already added with same name"
+                }
+                return JsonResponse(response, safe=False, status=409)
+
+        except Exception as ex:
+            print("Error on line {}".format(sys.exc_info()[-1].tb_lineno), type(ex).__name__, ex)
+            error = {
+                "message": "something went wrong"
+            }
+            return JsonResponse(error, safe=False, status=500)
+
+    async def get(self, request):
+        try:
+            search_index, search_query = build_role_search(request.GET)
+
+            res_filter_parameters = await async_cached_search(
+                get_async_client(),
+                index=search_index,
+                body=search_query,
+                filter_path=hits_filter_path(role_fields),
+            )
+            if len(res_filter_parameters) == 0:
+                response = {"data": [], "message": "No Data Found"}
+                return JsonResponse(response, safe=False, status=404)
+            else:
+                response_data = [format_role_hit(_res) for _res in res_filter_parameters['hits']['hits']]
+                response = {"data": response_data, "message": "Data Found"}
+                return JsonResponse(response, safe=False, status=200)
+
+        except Exception as ex:
+            print("Error on line {}".format(sys.exc_info()[-1].tb_lineno), type(ex).__name__, ex)
+            error = {
+                "message": "something went wrong"
+            }
+            return JsonResponse(error, safe=False, status=500)
+
+    async def patch(self, request):
+        try:
+            data = request.data
+            error = validate_body(data, role_patch_rules)
+            if error:
+                return JsonResponse({'error': error}, status=400)
+            elastic_id = data.get("id")
+            client = get_async_client()
+
+            ## first need to check if the document exists
+            search_query = build_search(build_query([ids_filter(elastic_id)]), size=1, source=False)
+
+            res_filter_parameters = await client.search(
+                index=role_index_name,
+                body=search_query,
+                filter_path=hits_filter_path([]),
+            )
+            if len(res_filter_parameters) == 0:
+                response = {
+                    "message": "Role not found"
+                }
+                return JsonResponse(response, safe=False, status=404)
+            else:
+                await client.update(
+                    index=role_index_name,
+                    id=str(elastic_id),
+                    body={
+                        "doc": {
+                            "role_name": data.get("name"),
+                            "access": data.get("access")
+                        }
+                    },
+                )
+                search_cache.invalidate(role_index_name)
+                response = {
+                    "message": "Role updated successfully"
+                }
+                return JsonResponse(response, safe=False, status=200)
+
+        except Exception as ex:
+            print("Error on line {}".format(sys.exc_info()[-1].tb_lineno), type(ex).__name__, ex)
+            error = {
+                "message": "something went wrong"
+            }
+            return JsonResponse(error, safe=False, status=500)
+
+
+class AsyncUsersData(AsyncAPIView):
+    authentication_required = False
+
+    async def post(self, request):
+        try:
+            data = request.data
+            error = validate_body(data, user_rules)
+            if error:
+                return JsonResponse({'error': error}, status=400)
+            name = data.get("name")
+            email = data.get("email")
+            password = data.get("password")
+            client = get_async_client()
+
+            ## first need to check if we have already added user in database with the same email
+            search_query = build_search(build_query([phrase_filter("email", email)]), size=1, source=False)
+
+            try:
+                res_filter_parameters = await client.search(
+                    index=user_index_name,
+                    body=search_query,
+                    filter_path=hits_filter_path([]),
+                )
+            except:
+                res_filter_parameters = []
+            if len(res_filter_parameters) == 0:
+                await sync_to_async(User.objects.create_user)(name, email, password)
+                json_data = {
+                    "name": name,
+                    "email":  email,
+                    "password":  password,
+                    "role": data.get("role"),
+                    "status": data.get("status"),
+                    "permission": data.get("permission"),
+                    "timestamp": int(datetime.datetime.now().timestamp())
+                }
+                await client.index(index=user_index_name, body=json_data, op_type="create")
+                search_cache.invalidate(user_index_name)
+                response = {
+                    "message": "Successfully Added the User"
+                }
+                return JsonResponse(response, safe=False, status=201)
+            else:
+                response = {
+                    "message": "User already added with same email"
+                }
+                return JsonResponse(response, safe=False, status=409)
+
+        except Exception as ex:
+            print("Error on line {}".format(sys.exc_info()[-1].tb_lineno), type(ex).__name__, ex)
+            error = {
+                "message": "something went wrong"
+            }
+            return JsonResponse(error, safe=False, status=500)
+
+    async def get(self, request):
+        try:
+            search_index, search_query = build_user_search(request.GET)
+
+            res_filter_parameters = await async_cached_search(
+                get_async_client(),
+                index=search_index,
+                body=search_query,
+                filter_path=hits_filter_path(user_fields),
+            )
+            if len(res_filter_parameters) == 0:
+                response = {"data": [], "message": "No Data Found"}
+                return JsonResponse(response, safe=False, status=404)
+            else:
+                response_data = [format_user_hit(_res) for _res in res_filter_parameters['hits']['hits']]
+                response = {"data": response_data, "message": "Data Found"}
+                return JsonResponse(response, safe=False, status=200)
+
+        except Exception as ex:
+            print("Error on line {}".format(sys.exc_info()[-1].tb_lineno), type(ex).__name__, ex)
+            error = {
+                "message": "something went wrong"
+            }
+            return JsonResponse(error, safe=False, status=500)
+
+    async def patch(self, request):
+        try:
+            data = request.data
+            error = validate_body(data, user_patch_rules)
+            if error:
+                return JsonResponse({'error': error}, status=400)
+            elastic_id = data.get("id")
+            client = get_async_client()
+
+            ## first need to check if the document exists
+            search_query = build_search(build_query([ids_filter(elastic_id)]), size=1, source=False)
+
+            res_filter_parameters = await client.search(
+                index=user_index_name,
+                body=search_query,
+                filter_path=hits_filter_path([]),
+            )
+            if len(res_filter_parameters) == 0:
+                response = {
+                    "message": "Role not found"
+                }
+                return JsonResponse(response, safe=False, status=404)
+            else:
+                await client.update(
+                    index=user_index_name,
+                    id=str(elastic_id),
+                    body={
+                        "doc": {
+                            "name": data.get("name"),
+                            "email": data.get("email"),
+                            "role": data.get("role"),
+                            "permission": data.get("permission"),
+                        }
+                    },
+                )
+                search_cache.invalidate(user_index_name)
+                response = {
+                    "message": "Role updated successfully"
+                }
+                return JsonResponse(response, safe=False, status=200)
+
+        except Exception as ex:
+            print("Error on line {}".format(sys.exc_info()[-1].tb_lineno), type(ex).__name__, ex)
+            error = {
+                "message": "something went wrong"
+            }
+            return JsonResponse(error, safe=False, status=500)
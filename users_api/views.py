@@ -3,6 +3,11 @@ import datetime
 from rest_framework.views import APIView
 from django.http import HttpResponse, JsonResponse
 from elastic_search_api_new.settings import es_url
+from elastic_search_api_new.search_cache import cached_search, search_cache
+from elastic_search_api_new.query_builder import build_query, build_search, phrase_filter, ids_filter, \
+    hits_filter_path
+from elastic_search_api_new.list_searches import user_index_name, role_index_name, build_role_search, \
+    format_role_hit, role_fields, build_user_search, format_user_hit, user_fields
 import os, sys
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
@@ -11,9 +16,34 @@ from rest_framework.authtoken.models import Token
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated  # <-- Here
 
-# Define the index name
-user_index_name = "users"
-role_index_name = "roles"
+# Required fields of the request bodies with their expected type and the error for a wrong type
+role_rules = [
+    ("name", str, 'Filenames must be an string.'),
+    ("access", dict, 'Filenames must be a object.'),
+]
+role_patch_rules = [("id", str, 'id must be an string.')] + role_rules
+user_rules = [
+    ("name", str, 'Filenames must be an string.'),
+    ("email", str, 'email must be an string.'),
+    ("password", str, 'password must be an string.'),
+    ("role", str, 'role must be a string.'),
+    ("permission", str, 'permission must be a string.'),
+    ("status", int, 'status must be a string.'),
+]
+user_patch_rules = [("id", str, 'id must be an string.')] + [
+    rule for rule in user_rules if rule[0] in ("name", "email", "role", "permission")
+]
+
+
+# Function to validate a request body against one of the rule lists, returns the first error or None
+def validate_body(data, rules):
+    for field, expected_type, type_error in rules:
+        value = data.get(field)
+        if not value:
+            return f'{field} is required in the JSON body.'
+        if not isinstance(value, expected_type):
+            return type_error
+    return None
 
 
 # Create your views here.
@@ -22,38 +52,19 @@ class AccessRoles(APIView):
     def post(self, request):
         try:
             data = request.data
+            error = validate_body(data, role_rules)
+            if error:
+                return JsonResponse({'error': error}, status=400)
             name = data.get("name")
             access = data.get("access")
-            if not name:
-                return JsonResponse({'error': 'name is required in the JSON body.'}, status=400)
-            if not isinstance(name, str):
-                return JsonResponse({'error': 'Filenames must be an string.'}, status=400)
-            if not access:
-                return JsonResponse({'error': 'access is required in the JSON body.'}, status=400)
-            if not isinstance(access, dict):
-                return JsonResponse({'error': 'Filenames must be a object.'}, status=400)
-
-            must_query = [{"match_phrase_prefix": {"role_name": name}}]
+
             ## first need to check if we have already added role in database with the same name
-            search_query = {
-                "query": {
-                    "bool": {
-                        "must": must_query,
-                        "minimum_should_match": 1,
-                        "boost": 1.0,
-                    }
-                },
-                "size": 0,
-                "from": 1 * 10,
-            }
+            search_query = build_search(build_query([phrase_filter("role_name", name)]), size=1, source=False)
 
             res_filter_parameters = es_url.search(
                 index=role_index_name,
                 body=search_query,
-                filter_path=[
-                    "hits.hits._id",
-                    "hits.hits._source.role_name",
-                ],
+                filter_path=hits_filter_path([]),
             )
             if len(res_filter_parameters) == 0:
                 json_data = {
@@ -62,6 +73,7 @@ class AccessRoles(APIView):
                     "timestamp": int(datetime.datetime.now().timestamp())
                 }
                 es_url.index(index=role_index_name, body=json_data, op_type="create")
+                search_cache.invalidate(role_index_name)
 
                 response = {
                     "message": "Successfully Added the role"
@@ -82,56 +94,19 @@ class AccessRoles(APIView):
 
     def get(self, request):
         try:
-            size = int(request.GET.get("size", 10))
-            page = int(request.GET.get("page", 0))
-            search = request.GET.get("search", "")
-            must_query = []
-            if search != "":
-                must_query.append({"match_phrase_prefix": {"role_name": search}})
-
-            if len(must_query) == 0:
-                search_query = {
-                    "query": {
-                        "match_all": {}
-                    },
-                    "size": size,
-                    "from": page * 10,
-                }
-            else:
-                search_query = {
-                    "query": {
-                        "bool": {
-                            "must": must_query,
-                            "minimum_should_match": 1,
-                            "boost": 1.0,
-                        }
-                    },
-                    "size": size,
-                    "from": page * 10,
-                }
+            search_index, search_query = build_role_search(request.GET)
 
-            res_filter_parameters = es_url.search(
-                index=role_index_name,
+            res_filter_parameters = cached_search(
+                index=search_index,
                 body=search_query,
-                filter_path=[
-                    "hits.hits._id",
-                    "hits.hits._source",
-                ],
+                filter_path=hits_filter_path(role_fields),
             )
             print(search_query)
             if len(res_filter_parameters) == 0:
                 response = {"data": [], "message": "No Data Found"}
                 return JsonResponse(response, safe=False, status=404)
             else:
-                response_data = []
-                for _res in res_filter_parameters['hits']['hits']:
-                    response_data.append(
-                        {
-                            "id": _res['_id'],
-                            "role_name": _res['_source']['role_name'],
-                            "access": _res['_source']['access'],
-                        }
-                    )
+                response_data = [format_role_hit(_res) for _res in res_filter_parameters['hits']['hits']]
                 response = {"data": response_data, "message": "Data Found"}
                 return JsonResponse(response, safe=False, status=200)
 
@@ -148,43 +123,20 @@ class AccessRoles(APIView):
     def patch(self, request):
         try:
             data = request.data
+            error = validate_body(data, role_patch_rules)
+            if error:
+                return JsonResponse({'error': error}, status=400)
             elastic_id = data.get("id")
             name = data.get("name")
             access = data.get("access")
-            if not elastic_id:
-                return JsonResponse({'error': 'id is required in the JSON body.'}, status=400)
-            if not name:
-                return JsonResponse({'error': 'name is required in the JSON body.'}, status=400)
-            if not isinstance(name, str):
-                return JsonResponse({'error': 'Filenames must be an string.'}, status=400)
-            if not isinstance(elastic_id, str):
-                return JsonResponse({'error': 'id must be an string.'}, status=400)
-            if not access:
-                return JsonResponse({'error': 'access is required in the JSON body.'}, status=400)
-            if not isinstance(access, dict):
-                return JsonResponse({'error': 'Filenames must be a object.'}, status=400)
-
-            must_query = [{"match": {"_id": elastic_id}}]
-            ## first need to check if we have already added role in database with the same name
-            search_query = {
-                "query": {
-                    "bool": {
-                        "must": must_query,
-                        "minimum_should_match": 1,
-                        "boost": 1.0,
-                    }
-                },
-                "size": 0,
-                "from": 1 * 10,
-            }
+
+            ## first need to check if the document exists
+            search_query = build_search(build_query([ids_filter(elastic_id)]), size=1, source=False)
 
             res_filter_parameters = es_url.search(
                 index=role_index_name,
                 body=search_query,
-                filter_path=[
-                    "hits.hits._id",
-                    "hits.hits._source.role_name",
-                ],
+                filter_path=hits_filter_path([]),
             )
             if len(res_filter_parameters) == 0:
                 response = {
@@ -202,6 +154,7 @@ class AccessRoles(APIView):
                         }
                     },
                 )
+                search_cache.invalidate(role_index_name)
                 response = {
                     "message": "Role updated successfully"
                 }
@@ -221,58 +174,24 @@ class UsersData(APIView):
     def post(self, request):
         try:
             data = request.data
+            error = validate_body(data, user_rules)
+            if error:
+                return JsonResponse({'error': error}, status=400)
             name = data.get("name")
             email = data.get("email")
             password = data.get("password")
             role_id = data.get("role")
             status = data.get("status")
             permission = data.get("permission")
-            if not name:
-                return JsonResponse({'error': 'name is required in the JSON body.'}, status=400)
-            if not isinstance(name, str):
-                return JsonResponse({'error': 'Filenames must be an string.'}, status=400)
-            if not email:
-                return JsonResponse({'error': 'email is required in the JSON body.'}, status=400)
-            if not isinstance(email, str):
-                return JsonResponse({'error': 'email must be an string.'}, status=400)
-            if not password:
-                return JsonResponse({'error': 'password is required in the JSON body.'}, status=400)
-            if not isinstance(password, str):
-                return JsonResponse({'error': 'password must be an string.'}, status=400)
-            if not role_id:
-                return JsonResponse({'error': 'role is required in the JSON body.'}, status=400)
-            if not isinstance(role_id, str):
-                return JsonResponse({'error': 'role must be a string.'}, status=400)
-            if not permission:
-                return JsonResponse({'error': 'permission is required in the JSON body.'}, status=400)
-            if not isinstance(permission, str):
-                return JsonResponse({'error': 'permission must be a string.'}, status=400)
-            if not status:
-                return JsonResponse({'error': 'status is required in the JSON body.'}, status=400)
-            if not isinstance(status, int):
-                return JsonResponse({'error': 'status must be a string.'}, status=400)
-
-            must_query = []
-            must_query.append({"match": {"email": email}})
-            ## first need to check if we have already added role in database with the same name
-            search_query = {
-                "query": {
-                    "bool": {
-                        "must": must_query
-                    }
-                },
-                "size": 1,
-                "from": 1,
-            }
+
+            ## first need to check if we have already added user in database with the same email
+            search_query = build_search(build_query([phrase_filter("email", email)]), size=1, source=False)
 
             try:
                 res_filter_parameters = es_url.search(
                     index=user_index_name,
                     body=search_query,
-                    filter_path=[
-                        "hits.hits._id",
-                        "hits.hits._source.name",
-                    ],
+                    filter_path=hits_filter_path([]),
                 )
             except:
                 res_filter_parameters = []
@@ -290,6 +209,7 @@ class UsersData(APIView):
                     "timestamp": int(datetime.datetime.now().timestamp())
                 }
                 es_url.index(index=user_index_name, body=json_data, op_type="create")
+                search_cache.invalidate(user_index_name)
                 response = {
                     "message": "Successfully Added the User"
                 }
@@ -309,59 +229,19 @@ class UsersData(APIView):
 
     def get(self, request):
         try:
-            size = int(request.GET.get("size", 10))
-            page = int(request.GET.get("page", 0))
-            search = request.GET.get("search", "")
-            must_query = []
-            if search != "":
-                must_query.append({"match_phrase_prefix": {"name": search}})
-
-            if len(must_query) == 0:
-                search_query = {
-                    "query": {
-                        "match_all": {}
-                    },
-                    "size": size,
-                    "from": page * 10,
-                }
-            else:
-                search_query = {
-                    "query": {
-                        "bool": {
-                            "must": must_query,
-                            "minimum_should_match": 1,
-                            "boost": 1.0,
-                        }
-                    },
-                    "size": size,
-                    "from": page * 10,
-                }
+            search_index, search_query = build_user_search(request.GET)
 
-            res_filter_parameters = es_url.search(
-                index=user_index_name,
+            res_filter_parameters = cached_search(
+                index=search_index,
                 body=search_query,
-                filter_path=[
-                    "hits.hits._id",
-                    "hits.hits._source",
-                ],
+                filter_path=hits_filter_path(user_fields),
             )
             print(search_query)
             if len(res_filter_parameters) == 0:
                 response = {"data": [], "message": "No Data Found"}
                 return JsonResponse(response, safe=False, status=404)
             else:
-                response_data = []
-                for _res in res_filter_parameters['hits']['hits']:
-                    response_data.append(
-                        {
-                            "id": _res['_id'],
-                            "name": _res['_source']['name'],
-                            "email": _res['_source']['email'],
-                            "role": _res['_source']['role'],
-                            "status": _res['_source']['status'],
-                            "permission": _res['_source']['permission'],
-                        }
-                    )
+                response_data = [format_user_hit(_res) for _res in res_filter_parameters['hits']['hits']]
                 response = {"data": response_data, "message": "Data Found"}
                 return JsonResponse(response, safe=False, status=200)
 
@@ -378,51 +258,22 @@ class UsersData(APIView):
     def patch(self, request):
         try:
             data = request.data
+            error = validate_body(data, user_patch_rules)
+            if error:
+                return JsonResponse({'error': error}, status=400)
             elastic_id = data.get("id")
             name = data.get("name")
             email = data.get("email")
             role_id = data.get("role")
             permission = data.get("permission")
-            if not elastic_id:
-                return JsonResponse({'error': 'id is required in the JSON body.'}, status=400)
-            if not name:
-                return JsonResponse({'error': 'name is required in the JSON body.'}, status=400)
-            if not isinstance(name, str):
-                return JsonResponse({'error': 'Filenames must be an string.'}, status=400)
-            if not email:
-                return JsonResponse({'error': 'email is required in the JSON body.'}, status=400)
-            if not isinstance(email, str):
-                return JsonResponse({'error': 'email must be an string.'}, status=400)
-            if not role_id:
-                return JsonResponse({'error': 'role is required in the JSON body.'}, status=400)
-            if not isinstance(role_id, str):
-                return JsonResponse({'error': 'role must be a string.'}, status=400)
-            if not permission:
-                return JsonResponse({'error': 'permission is required in the JSON body.'}, status=400)
-            if not isinstance(permission, str):
-                return JsonResponse({'error': 'permission must be a string.'}, status=400)
-
-            must_query = [{"match": {"_id": elastic_id}}]
-            ## first need to check if we have already added role in database with the same name
-            search_query = {
-                "query": {
-                    "bool": {
-                        "must": must_query,
-                        "minimum_should_match": 1,
-                        "boost": 1.0,
-                    }
-                },
-                "size": 0,
-                "from": 1 * 10,
-            }
+
+            ## first need to check if the document exists
+            search_query = build_search(build_query([ids_filter(elastic_id)]), size=1, source=False)
 
             res_filter_parameters = es_url.search(
                 index=user_index_name,
                 body=search_query,
-                filter_path=[
-                    "hits.hits._id",
-                    "hits.hits._source",
-                ],
+                filter_path=hits_filter_path([]),
             )
             if len(res_filter_parameters) == 0:
                 response = {
@@ -431,7 +282,7 @@ class UsersData(APIView):
                 return JsonResponse(response, safe=False, status=404)
             else:
                 es_url.update(
-                    index=role_index_name,
+                    index=user_index_name,
                     id=str(elastic_id),
                     body={
                         "doc": {
@@ -442,6 +293,7 @@ class UsersData(APIView):
                         }
                     },
                 )
+                search_cache.invalidate(user_index_name)
                 response = {
                     "message": "Role updated successfully"
                 }